@@ -0,0 +1,507 @@
+"""
+Micro-benchmarks of the algorithm's hot paths
+"""
+import json
+import random
+import logging
+import platform
+import itertools
+import statistics
+import time
+from dataclasses import dataclass, asdict
+from typing import Callable, List, Dict, Tuple, Iterator, Optional, Type
+
+import fire
+import numpy as np
+from terminaltables import AsciiTable
+
+from main import POPULATION_SIZES
+from path_finder.cache import create_cache
+from path_finder.chromosome import Chromosome, random_chromosome, to_flat
+from path_finder.environments import ENVS, Size, SWEEP_SIZES
+from path_finder.finder import Finder
+from path_finder.fitness import (
+    Fitness,
+    PathFinderFitnessRewardLengthDistanceGroupsWithLimit,
+    PathFinderFitnessWalkingDistance,
+)
+from path_finder.operators import (
+    PathFinderCross,
+    SwitchMutation,
+    AddMutation,
+    RemoveMutation,
+    RemovePairMutation,
+)
+from path_finder.point import distance
+from path_finder.population import Population
+from path_finder.selector import SELECTORS
+from path_finder.stop import SolutionFound, GenerationLimit
+
+logging.getLogger().setLevel(logging.INFO)
+
+FITNESS_CLASS = PathFinderFitnessRewardLengthDistanceGroupsWithLimit
+MUTATIONS = [SwitchMutation, AddMutation, RemoveMutation, RemovePairMutation]
+SAMPLE_SIZE = 200  # chromosomes per call of the simulation and operator benchmarks
+DEFAULT_THRESHOLD = 0.1  # relative change reported as a regression or improvement
+# environments where walls mislead fitness functions that ignore them
+CONVERGENCE_ENVS = ["wall_env", "multi_wall_env", "multiway_wall_env"]
+CONVERGENCE_FITNESSES = [
+    PathFinderFitnessRewardLengthDistanceGroupsWithLimit,
+    PathFinderFitnessWalkingDistance,
+]
+
+
+@dataclass
+class Measurement:
+    """
+    The timing of a single benchmark case
+    """
+
+    name: str
+    case: str  # the parameters of the case, e.g. "wall_env-MEDIUM-40"
+    unit: str  # what a call processes, e.g. "genes"
+    units_per_call: int
+    median: float  # seconds per call
+    best: float  # seconds per call
+    repeats: List[float]
+
+    @property
+    def key(self) -> str:
+        """
+        :return: identifies the case across runs
+        """
+        return f"{self.name}/{self.case}"
+
+    @property
+    def throughput(self) -> float:
+        """
+        :return: units processed per second, at the median timing
+        """
+        return self.units_per_call / self.median if self.median else float("inf")
+
+
+@dataclass
+class Convergence:
+    """
+    How fast runs of a setting reached the target
+    """
+
+    case: str
+    fitness: str
+    solved: int  # amount of runs which reached the target
+    runs: int
+    generations: Optional[float]  # median generation the solved runs reached it in
+    seconds: float  # median wall-clock time of a run, solved or not
+
+
+def measure(
+    call: Callable[[], None], warmup: int, repeats: int, min_time: float
+) -> List[float]:
+    """
+    :param call: The code to time
+    :param warmup: Amount of untimed calls to make first
+    :param repeats: Amount of timings to take
+    :param min_time: Each timing calls `call` as many times as needed to last at
+        least this many seconds
+    :return: The seconds per call of each timing
+    """
+    for _ in range(warmup):
+        call()
+
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            call()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number *= 2
+
+    timings = [elapsed / number]
+    for _ in range(repeats - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            call()
+        timings.append((time.perf_counter() - start) / number)
+
+    return timings
+
+
+def _sample(grid, count: int) -> List[Chromosome]:
+    """
+    :param grid: The environment the chromosomes are meant for
+    :param count: Amount of chromosomes
+    :return: random chromosomes of the lengths the Finder starts with
+    """
+    min_dist = distance(grid.start, grid.target)
+    return [
+        random_chromosome(random.randint(min_dist, min_dist * 2)) for _ in range(count)
+    ]
+
+
+def simulation_cases(envs, sizes, populations) -> Iterator[Tuple]:
+    """
+    GridWrapper.simulate_movement, without caching
+    """
+    for env_name, grid_size in itertools.product(envs, sizes):
+        grid = ENVS[env_name](grid_size)
+        grid.cache = create_cache(0)
+        chroms = _sample(grid, SAMPLE_SIZE)
+
+        def call(grid=grid, chroms=chroms):
+            for chrom in chroms:
+                grid.simulate_movement(chrom)
+
+        yield f"{env_name}-{grid_size.name}", "genes", sum(map(len, chroms)), call
+
+
+def fitness_cases(envs, sizes, populations) -> Iterator[Tuple]:
+    """
+    Fitness.evaluate, without memoization
+    """
+    for env_name, grid_size in itertools.product(envs, sizes):
+        grid = ENVS[env_name](grid_size)
+        grid.cache = create_cache(0)
+        fitness = FITNESS_CLASS(grid, memo=create_cache(0))
+        chroms = _sample(grid, SAMPLE_SIZE)
+        yield (
+            f"{env_name}-{grid_size.name}",
+            "evaluations",
+            len(chroms),
+            lambda fitness=fitness, chroms=chroms: fitness.evaluate(chroms),
+        )
+
+
+def operator_cases(envs, sizes, populations) -> Iterator[Tuple]:
+    """
+    Every mutation, per chromosome and batched, and the cross
+    """
+    grid = ENVS[envs[0]](sizes[-1])
+    min_dist = distance(grid.start, grid.target)
+    chroms = _sample(grid, SAMPLE_SIZE)
+    genes = sum(map(len, chroms))
+    genes_array, offsets = to_flat(chroms)
+    rng = np.random.default_rng(0)
+    for mutation_class in MUTATIONS:
+        mutation = mutation_class(min_dist)
+
+        def call(mutation=mutation):
+            for chrom in chroms:
+                mutation(chrom)
+
+        def batch_call(mutation=mutation):
+            mutation.mutate_batch(genes_array, offsets, rng)
+
+        yield mutation_class.__name__, "genes", genes, call
+        yield f"{mutation_class.__name__}-batched", "genes", genes, batch_call
+
+    cross = PathFinderCross()
+    couples = list(zip(chroms, reversed(chroms)))
+
+    def cross_call():
+        for parent1, parent2 in couples:
+            cross(parent1, parent2)
+
+    yield PathFinderCross.__name__, "genes", genes, cross_call
+
+
+def selection_cases(envs, sizes, populations) -> Iterator[Tuple]:
+    """
+    Every selector, selecting a whole generation
+    """
+    grid = ENVS[envs[0]](sizes[-1])
+    fitness = FITNESS_CLASS(grid)
+    rng = np.random.default_rng(0)
+    for population_size in populations:
+        chroms = _sample(grid, population_size)
+        evaluations = fitness.evaluate(chroms)
+        for method, selector_class in SELECTORS.items():
+
+            def call(selector_class=selector_class, chroms=chroms, evals=evaluations):
+                # every generation ranks a new population
+                population = Population(chroms, fitness, evals)
+                selector_class(population).select(population.population_length, rng)
+
+            case = f"{method.value}-{population_size}"
+            yield case, "selections", population_size, call
+
+
+def generation_cases(envs, sizes, populations) -> Iterator[Tuple]:
+    """
+    Finder.run_generation, per child and batched
+    """
+    for env_name, grid_size, population_size in itertools.product(
+        envs, sizes, populations
+    ):
+        for batched in (False, True):
+            finder = Finder(
+                ENVS[env_name](grid_size),
+                population_size,
+                FITNESS_CLASS,
+                batched=batched,
+            )
+            case = f"{env_name}-{grid_size.name}-{population_size}"
+            yield (
+                f"{case}-batched" if batched else case,
+                "children",
+                population_size,
+                finder.run_generation,
+            )
+
+
+# every benchmark yields its cases for the given environments, grid sizes and
+# population sizes, as (case, unit, units per call, the code to time)
+BENCHMARKS = {
+    "simulation": simulation_cases,
+    "fitness": fitness_cases,
+    "operators": operator_cases,
+    "selection": selection_cases,
+    "generation": generation_cases,
+}
+
+
+def run(
+    names: List[str],
+    envs: List[str],
+    sizes: List[Size],
+    populations: List[int],
+    seed: int,
+    warmup: int,
+    repeats: int,
+    min_time: float,
+) -> List[Measurement]:
+    """
+    :param names: The benchmarks to run, see BENCHMARKS
+    :param envs: The environments to run on
+    :param sizes: The grid sizes to run on
+    :param populations: The population sizes to run with
+    :param seed: Seed of the random generators, set before every benchmark
+    :param warmup: see measure
+    :param repeats: see measure
+    :param min_time: see measure
+    :return: The measurement of every case
+    """
+    measurements = []
+    for name in names:
+        logging.info("running %s", name)
+        random.seed(seed)
+        for case, unit, units, call in BENCHMARKS[name](envs, sizes, populations):
+            timings = measure(call, warmup, repeats, min_time)
+            measurements.append(
+                Measurement(
+                    name,
+                    case,
+                    unit,
+                    units,
+                    statistics.median(timings),
+                    min(timings),
+                    timings,
+                )
+            )
+
+    return measurements
+
+
+def convergence(
+    envs: List[str],
+    sizes: List[Size],
+    populations: List[int],
+    fitness_classes: List[Type[Fitness]],
+    seed: int,
+    runs: int,
+    max_generations: int,
+) -> List[Convergence]:
+    """
+    Runs the finder until it reaches the target, with every fitness function
+    :param envs: The environments to run on
+    :param sizes: The grid sizes to run on
+    :param populations: The population sizes to run with
+    :param fitness_classes: The fitness functions to compare
+    :param seed: Seed of the first run, each run uses the next one
+    :param runs: Amount of runs of every setting
+    :param max_generations: Runs which did not reach the target by this generation
+        are stopped and counted as unsolved
+    :return: The convergence of every setting
+    """
+    results = []
+    for env_name, grid_size, population_size, fitness_class in itertools.product(
+        envs, sizes, populations, fitness_classes
+    ):
+        logging.info("converging %s %s", env_name, fitness_class.__name__)
+        generations = []
+        seconds = []
+        for run_seed in range(seed, seed + runs):
+            random.seed(run_seed)
+            with Finder(
+                ENVS[env_name](grid_size), population_size, fitness_class, batched=True
+            ) as finder:
+                result = finder.run(
+                    SolutionFound(shortest=False) | GenerationLimit(max_generations)
+                )
+            seconds.append(result.elapsed)
+            if result.distance == 0:
+                generations.append(result.generation)
+
+        results.append(
+            Convergence(
+                f"{env_name}-{grid_size.name}-{population_size}",
+                fitness_class.__name__,
+                len(generations),
+                runs,
+                statistics.median(generations) if generations else None,
+                statistics.median(seconds),
+            )
+        )
+
+    return results
+
+
+def compare(
+    measurements: List[Measurement], baseline: Dict, threshold: float
+) -> AsciiTable:
+    """
+    :param measurements: The measurements of this run
+    :param baseline: A report written by a previous run
+    :param threshold: Relative change of the median below which a case is unchanged
+    :return: A table comparing every case found in both runs
+    """
+    previous = {
+        f"{result['name']}/{result['case']}": result for result in baseline["results"]
+    }
+    rows = [["benchmark", "baseline (s)", "current (s)", "speedup", ""]]
+    for measurement in measurements:
+        if measurement.key not in previous:
+            continue
+
+        old = previous[measurement.key]["median"]
+        speedup = old / measurement.median if measurement.median else float("inf")
+        if speedup > 1 + threshold:
+            verdict = "faster"
+        elif speedup < 1 / (1 + threshold):
+            verdict = "SLOWER"
+        else:
+            verdict = ""
+        rows.append(
+            [
+                measurement.key,
+                f"{old:.3g}",
+                f"{measurement.median:.3g}",
+                f"{speedup:.2f}x",
+                verdict,
+            ]
+        )
+
+    return AsciiTable(rows)
+
+
+def main(
+    only: str = None,
+    env_name: str = None,
+    size: str = None,
+    pop_size: int = None,
+    output: str = "benchmark.json",
+    baseline: str = None,
+    threshold: float = DEFAULT_THRESHOLD,
+    seed: int = 0,
+    warmup: int = 1,
+    repeats: int = 5,
+    min_time: float = 0.05,
+    converge: bool = False,
+    runs: int = 3,
+    max_generations: int = 1500,
+):
+    """
+    runs the benchmarks, writes their results as json and optionally compares them
+    to a previous run
+    :param only: comma separated benchmarks to run. defaults to all of
+        simulation, fitness, operators, selection and generation
+    :param env_name: specific environment to use. defaults to all
+    :param size: specific grid size to use. defaults to all but HUGE
+    :param pop_size: specific population size to use. defaults to all
+    :param output: path of the json report to write
+    :param baseline: path of a json report of a previous run to compare against
+    :param threshold: relative change reported as faster / slower
+    :param seed: seed of the random generators
+    :param warmup: untimed calls before timing each case
+    :param repeats: timings taken of each case, the median is reported
+    :param min_time: minimal seconds of a single timing
+    :param converge: also compare the generations and time to reach the target of
+        the fitness functions in CONVERGENCE_FITNESSES. runs on CONVERGENCE_ENVS
+        unless an environment is given
+    :param runs: convergence: runs of every setting
+    :param max_generations: convergence: generations after which a run is unsolved
+    """
+    if only is None:
+        names = list(BENCHMARKS)
+    else:  # fire parses comma separated values as a tuple
+        names = [only] if isinstance(only, str) else list(only)
+    measurements = run(
+        names,
+        [env_name] if env_name else list(ENVS),
+        [Size[size]] if size else SWEEP_SIZES,
+        [pop_size] if pop_size else POPULATION_SIZES,
+        seed,
+        warmup,
+        repeats,
+        min_time,
+    )
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "platform": platform.platform(),
+            "seed": seed,
+            "warmup": warmup,
+            "repeats": repeats,
+            "min_time": min_time,
+        },
+        "results": [
+            dict(asdict(measurement), throughput=measurement.throughput)
+            for measurement in measurements
+        ],
+    }
+    if converge:
+        convergences = convergence(
+            [env_name] if env_name else CONVERGENCE_ENVS,
+            [Size[size]] if size else [Size.MEDIUM],
+            [pop_size] if pop_size else [POPULATION_SIZES[-1]],
+            CONVERGENCE_FITNESSES,
+            seed,
+            runs,
+            max_generations,
+        )
+        report["meta"].update(runs=runs, max_generations=max_generations)
+        report["convergence"] = [asdict(result) for result in convergences]
+    with open(output, "wt") as f:
+        json.dump(report, f, indent=2)
+
+    rows = [["benchmark", "median (s)", "throughput"]] + [
+        [
+            measurement.key,
+            f"{measurement.median:.3g}",
+            f"{measurement.throughput:,.0f} {measurement.unit}/s",
+        ]
+        for measurement in measurements
+    ]
+    print(AsciiTable(rows).table)
+    if baseline is not None:
+        with open(baseline, "rt") as f:
+            print(compare(measurements, json.load(f), threshold).table)
+    if converge:
+        rows = [["case", "fitness", "solved", "generations", "median (s)"]] + [
+            [
+                result.case,
+                result.fitness,
+                f"{result.solved}/{result.runs}",
+                "-" if result.generations is None else f"{result.generations:g}",
+                f"{result.seconds:.3g}",
+            ]
+            for result in convergences
+        ]
+        print(AsciiTable(rows).table)
+
+
+if __name__ == "__main__":
+    fire.Fire(main)
@@ -5,7 +5,7 @@ import logging
 import os.path
 import itertools
 import matplotlib.pyplot as plt
-from path_finder.environments import ENVS, Size
+from path_finder.environments import ENVS, Size, SWEEP_SIZES
 from main import POPULATION_SIZES
 from path_finder.reporter import Reader
 
@@ -34,32 +34,23 @@ class GraphCreator:
         """
         logging.info(f"starting {self.env_name} {self.grid_size.name}")
         population_stats = {
-            pop_size: list(
-                Reader(
-                    os.path.join(
-                        self.base_path,
-                        f"{self.env_name}-{self.grid_size.name}-{pop_size}",
-                    )
-                ).read()
-            )
+            pop_size: Reader(
+                os.path.join(
+                    self.base_path, f"{self.env_name}-{self.grid_size.name}-{pop_size}",
+                )
+            ).read_records()
             for pop_size in POPULATION_SIZES
         }
-        max_generation = max(len(pop) for pop in population_stats.values())
-        self.save_graph(
-            population_stats, max_generation, "length", "Path Length (Cells)",
-        )
+        self.save_graph(population_stats, "length", "Path Length (Cells)")
         self.save_graph(
             population_stats,
-            max_generation,
             "distance",
             "Distance from target (Cells)",
         )
-        self.save_graph(population_stats, max_generation, "fitness")
+        self.save_graph(population_stats, "fitness")
         logging.info("done")
 
-    def save_graph(
-        self, population_stats, max_generation, stat_name, y_title=None,
-    ) -> None:
+    def save_graph(self, population_stats, stat_name, y_title=None) -> None:
         logging.info(f"generating stat {stat_name}")
         y_title = y_title if y_title else stat_name.capitalize()
         fig, axs = plt.subplots(
@@ -69,9 +60,7 @@ class GraphCreator:
         for i, stat_type in enumerate(("top", "median",)):
             ax = axs[i]
             for pop_size, stats in population_stats.items():
-                self.add_plot(
-                    f"{stat_type}_{stat_name}", stats, max_generation, pop_size, ax
-                )
+                self.add_plot(f"{stat_type}_{stat_name}", stats, pop_size, ax)
             ax.set_ylabel(y_title)
             ax.legend(loc="best")
 
@@ -83,18 +72,12 @@ class GraphCreator:
         plt.close(fig)
         plt.clf()
 
-    def add_plot(self, stat_type, stats, max_generation, pop_size, ax) -> None:
+    def add_plot(self, stat_type, stats, pop_size, ax) -> None:
         sampling = 1
-        dots = [
-            getattr(stat, stat_type)
-            for i, stat in enumerate(stats)
-            if i % sampling == 0
-        ]
+        dots = stats[stat_type][::sampling]
         logging.debug(f"got {len(dots)} dots")
         ax.plot(
-            range(1, max_generation + 2, sampling)[: len(dots)],
-            dots,
-            label=f"{stat_type}: {pop_size}",
+            stats["generation"][::sampling] + 1, dots, label=f"{stat_type}: {pop_size}",
         )
 
 
@@ -102,7 +85,7 @@ def main():
     """
     Generates graphs from algorithm metrics data
     """
-    for (env_name, env), grid_size in itertools.product(ENVS.items(), list(Size)):
+    for (env_name, env), grid_size in itertools.product(ENVS.items(), SWEEP_SIZES):
         GraphCreator("out", env_name, grid_size).create_graph()
 
 
@@ -1,13 +1,20 @@
 """
 An interface to run the path finder genetic algorithm
 """
-from typing import Callable
+from typing import Callable, Type, Dict
+from dataclasses import asdict
 import os.path
+import contextlib
+import csv
+import functools
 import itertools
 import logging
 import progressbar
 import fire
 
+from path_finder.cache import EvictionPolicy, create_cache
+from path_finder.checkpoint import Checkpoint, CHECKPOINT_FILE
+from path_finder.chromosome import Chromosome, from_letters
 from path_finder.finder import Finder
 from path_finder.point import distance
 from path_finder.environments import *
@@ -15,12 +22,34 @@ from path_finder.fitness import (
     PathFinderFitnessRewardLength,
     PathFinderFitnessRewardLengthDistanceGroups,
     PathFinderFitnessRewardLengthDistanceGroupsWithLimit,
+    PathFinderFitnessWalkingDistance,
+    Fitness,
 )
+from path_finder.initializer import InitializationMethod, SeedingMix
+from path_finder.islands import IslandFinder, IslandState, Topology
+from path_finder.maps import map_env
+from path_finder.parallel import ParallelEvaluator
 from path_finder.reporter import Reporter
+from path_finder.selector import SelectionMethod, SELECTORS
+from path_finder.stop import (
+    StopCriterion,
+    SolutionFound,
+    Stagnation,
+    Deadline,
+    EvaluationBudget,
+    GenerationLimit,
+)
+from path_finder.sweep import SweepJob, SweepScheduler
 
 logging.getLogger().setLevel(logging.INFO)
 
 POPULATION_SIZES = [20, 40, 60]
+DEFAULT_STOP_CRITERION = SolutionFound() | Stagnation(1500)
+FITNESSES = {
+    "groups": PathFinderFitnessRewardLengthDistanceGroupsWithLimit,
+    "walking": PathFinderFitnessWalkingDistance,
+}
+DEFAULT_FITNESS = "groups"
 
 
 def run_for_env(
@@ -28,6 +57,26 @@ def run_for_env(
     creator: Callable[[int], GridWrapper],
     grid_size: Size,
     population_size: int,
+    cache_budget: int = None,
+    cache_policy: EvictionPolicy = EvictionPolicy.LRU,
+    workers: int = 0,
+    batch_size: int = ParallelEvaluator.DEFAULT_BATCH_SIZE,
+    parallel_threshold: int = ParallelEvaluator.DEFAULT_THRESHOLD,
+    stop: StopCriterion = None,
+    report_interval: int = 1,
+    compact: bool = False,
+    drop_bumps: bool = False,
+    batched: bool = False,
+    selection: SelectionMethod = SelectionMethod.RANKING,
+    profile: bool = False,
+    fitness_class: Type[Fitness] = FITNESSES[DEFAULT_FITNESS],
+    seeding: SeedingMix = None,
+    hint: Chromosome = None,
+    adaptive: bool = False,
+    checkpoint_interval: int = 0,
+    resume: bool = False,
+    warm_start: str = None,
+    progress: Callable[[int], None] = None,
 ) -> None:
     """
     Executes the genetic algorithm for a specific setting
@@ -35,61 +84,379 @@ def run_for_env(
     :param creator: environment creator function
     :param grid_size: the grid size to use
     :param population_size: the population size to use
+    :param cache_budget: byte budget of the simulation cache. defaults to the grid's
+    :param cache_policy: eviction policy of the simulation cache
+    :param workers: amount of processes to evaluate fitness on, see Finder
+    :param batch_size: chromosomes sent to a worker at once, see Finder
+    :param parallel_threshold: least new chromosomes evaluated on the workers, see
+        Finder
+    :param stop: when to stop the run. defaults to DEFAULT_STOP_CRITERION
+    :param report_interval: record metrics every this many generations
+    :param compact: truncate chromosomes reaching the target, see Finder
+    :param drop_bumps: also drop genes bumping into walls when compacting
+    :param batched: breed each generation at once on arrays, see Finder
+    :param selection: the selection method to use
+    :param profile: record the time spent in every phase of a generation
+    :param fitness_class: the fitness function to use
+    :param seeding: how to create the first population, see Finder
+    :param hint: a path to seed the population with, see Finder
+    :param adaptive: adapt the mutation probabilities to the progress, see Finder
+    :param checkpoint_interval: save a checkpoint every this many generations. 0
+        never saves
+    :param resume: continue from the run's checkpoint, if it has one
+    :param warm_start: path of a checkpoint of a related run to seed the
+        population with, see Checkpoint.warm_start
+    :param progress: called with the generation reached. if not given, progress is
+        shown on the terminal along with every new top path
     """
     logging.info("starting execution for %s", name)
     grid = creator(grid_size)
+    if cache_budget is not None:
+        grid.cache = create_cache(cache_budget, cache_policy)
     finder = Finder(
-        grid, population_size, PathFinderFitnessRewardLengthDistanceGroupsWithLimit
+        grid,
+        population_size,
+        fitness_class,
+        workers,
+        batch_size,
+        parallel_threshold,
+        compact=compact,
+        drop_bumps=drop_bumps,
+        batched=batched,
+        selector_class=SELECTORS[selection],
+        profile=profile,
+        seeding=seeding,
+        hint=hint,
+        adaptive=adaptive,
     )
+    path = os.path.join("out", name)
+    checkpoint_path = os.path.join(path, CHECKPOINT_FILE)
+    checkpoint = None
+    try:
+        if resume and os.path.exists(checkpoint_path):
+            checkpoint = Checkpoint.load(checkpoint_path)
+            checkpoint.restore(finder)
+            logging.info("resuming %s from generation %d", name, checkpoint.generation)
+        elif warm_start is not None:
+            Checkpoint.load(warm_start).warm_start(finder)
+    except BaseException:
+        # the workers are otherwise only released by the with block below
+        finder.close()
+        raise
+
+    top_score = 0
+    interactive = progress is None
+    with finder, Reporter(
+        finder,
+        path,
+        interval=report_interval,
+        binary=True,
+        resume=checkpoint.reporter_cursor if checkpoint is not None else None,
+    ) as reporter, (
+        progressbar.ProgressBar(max_value=progressbar.UnknownLength)
+        if interactive
+        else contextlib.nullcontext()
+    ) as bar:
+        if interactive:
+            progress = bar.update
+
+        def on_generation(finder: Finder) -> None:
+            nonlocal top_score
+            if (
+                checkpoint_interval
+                and finder.generation % checkpoint_interval == 0
+                and (checkpoint is None or finder.generation != checkpoint.generation)
+            ):
+                # before reporting, a resumed run reports this generation again
+                Checkpoint.capture(finder, reporter).save(checkpoint_path)
+
+            reporter.report()
+            progress(finder.generation)
+            if finder.population.top_fitness == top_score:
+                return
+
+            if interactive and grid.drawable:
+                message = (
+                    "new top fitness"
+                    if finder.population.top_fitness > top_score
+                    else "we lost our top score"
+                )
+                top_evaluation = finder.population.top_evaluation
+                table = grid.to_table(finder.population.top_item, top_evaluation.steps)
+                print("\n" + table.table)
+                logging.info(
+                    "%s. distance from target: %d", message, top_evaluation.distance
+                )
+
+            top_score = finder.population.top_fitness
+
+        result = finder.run(
+            stop if stop is not None else DEFAULT_STOP_CRITERION, on_generation
+        )
+
+    logging.info(
+        "stopped on %s after %d generations and %d evaluations (%.1fs)",
+        result.reason,
+        result.generation,
+        result.evaluations,
+        result.elapsed,
+    )
+    cache_stats = grid.cache.stats
+    logging.info(
+        "simulation cache: %d hits, %d misses, %d evictions (%.1f%% hit rate)",
+        cache_stats.hits,
+        cache_stats.misses,
+        cache_stats.evictions,
+        cache_stats.hit_rate * 100,
+    )
+    memo_stats = finder.fitness_func.memo.stats
+    logging.info(
+        "fitness memo: %d hits, %d misses (%.1f%% hit rate)",
+        memo_stats.hits,
+        memo_stats.misses,
+        memo_stats.hit_rate * 100,
+    )
+    logging.info("execution for %s done", name)
+
+
+def run_islands_for_env(
+    name: str,
+    creator: Callable[[int], GridWrapper],
+    grid_size: Size,
+    population_size: int,
+    islands: int,
+    migration_interval: int = 20,
+    migration_size: int = 2,
+    topology: Topology = Topology.RING,
+    fitness_class: Type[Fitness] = FITNESSES[DEFAULT_FITNESS],
+    progress: Callable[[int], None] = None,
+) -> None:
+    """
+    Executes the island model genetic algorithm for a specific setting
+    :param name: name for the execution
+    :param creator: environment creator function
+    :param grid_size: the grid size to use
+    :param population_size: the population size of each island
+    :param islands: amount of islands to run
+    :param migration_interval: amount of generations between migrations
+    :param migration_size: amount of top chromosomes each island sends
+    :param topology: migration topology
+    :param fitness_class: the fitness function to use
+    :param progress: see run_for_env
+    """
+    logging.info("starting island execution for %s", name)
+    grid = creator(grid_size)
+    path = os.path.join("out", name)
+    os.makedirs(path, exist_ok=True)
     top_score = 0
     no_change_count = 0
-    with Reporter(
-        finder, os.path.join("out", name)
-    ) as reporter, progressbar.ProgressBar(max_value=progressbar.UnknownLength) as bar:
-        dist = grid.calculate_distance(finder.population.top_item)
+    with IslandFinder(
+        grid,
+        islands,
+        population_size,
+        fitness_class,
+        migration_interval,
+        migration_size,
+        topology,
+    ) as finder, open(os.path.join(path, "islands.csv"), "wt") as f:
+        writer = csv.DictWriter(f, list(IslandState.__annotations__.keys()))
+        writer.writeheader()
+        dist = None
         while (
-            dist != 0
-            or len(finder.population.top_item) > distance(grid.start, grid.target)
+            dist != 0 or len(finder.best.chromosome) > distance(grid.start, grid.target)
         ) and no_change_count < 1500:
-            reporter.report()
-            finder.run_generation()
-            bar.update(finder.generation)
+            finder.run_epoch()
+            writer.writerows([asdict(state) for state in finder.states])
+            if progress is not None:
+                progress(finder.generation)
 
-            if finder.population.top_fitness > top_score:
+            dist = finder.best.evaluation.distance
+            if finder.best.fitness > top_score:
                 no_change_count = 0
-                top_score = finder.population.top_fitness
-                print("\n" + grid.to_table(finder.population.top_item).table)
-                logging.info("new top fitness. distance from target: %d", dist)
+                top_score = finder.best.fitness
+                if progress is None and grid.drawable:
+                    print(
+                        "\n"
+                        + grid.to_table(
+                            finder.best.chromosome, finder.best.evaluation.steps
+                        ).table
+                    )
+                    logging.info(
+                        "generation %d: new top fitness. distance from target: %d",
+                        finder.generation,
+                        dist,
+                    )
             else:
-                no_change_count += 1
-
-            if finder.population.top_fitness < top_score:
-                top_score = finder.population.top_fitness
-                print("\n" + grid.to_table(finder.population.top_item).table)
-                logging.info("we lost our top score. current dist: %d", dist)
+                no_change_count += migration_interval
 
-            dist = grid.calculate_distance(finder.population.top_item)
+        if grid.drawable:
+            with open(os.path.join(path, "final_grid.txt"), "wt") as f:
+                table = grid.to_table(
+                    finder.best.chromosome, finder.best.evaluation.steps
+                )
+                f.write(table.table + "\n")
 
-        reporter.report()
-    logging.info("execution for %s done", name)
+    logging.info("island execution for %s done", name)
 
 
-def main(env_name: str = None, pop_size: int = None, size: str = None):
+def main(
+    env_name: str = None,
+    map_path: str = None,
+    pop_size: int = None,
+    size: str = None,
+    cache_mb: float = None,
+    cache_policy: str = EvictionPolicy.LRU.value,
+    workers: int = 0,
+    batch_size: int = ParallelEvaluator.DEFAULT_BATCH_SIZE,
+    parallel_threshold: int = ParallelEvaluator.DEFAULT_THRESHOLD,
+    islands: int = 0,
+    migration_interval: int = 20,
+    migration_size: int = 2,
+    topology: str = Topology.RING.value,
+    jobs: int = None,
+    force: bool = False,
+    deadline: float = None,
+    max_evaluations: int = None,
+    max_generations: int = None,
+    report_interval: int = 1,
+    compact: bool = False,
+    drop_bumps: bool = False,
+    batched: bool = False,
+    selection: str = SelectionMethod.RANKING.value,
+    profile: bool = False,
+    fitness: str = DEFAULT_FITNESS,
+    seeding: Dict[str, float] = None,
+    hint: str = None,
+    adaptive: bool = False,
+    checkpoint_interval: int = 0,
+    resume: bool = False,
+    warm_start: str = None,
+):
     """
     interface for running the algorithm
     :param env_name: specific environment to use. defaults to all
+    :param map_path: run on a map file instead of the preset environments, see the
+        maps module for the supported formats
     :param pop_size: specific population size to use. defaults to all
-    :param size: specific grid size to use. defaults to all
+    :param size: specific grid size to use. defaults to all but HUGE
+    :param cache_mb: memory budget of the simulation cache, in MB
+    :param cache_policy: eviction policy of the simulation cache (lru / clock)
+    :param workers: amount of processes to evaluate fitness on. defaults to serial
+        evaluation
+    :param batch_size: workers: chromosomes sent to a worker at once
+    :param parallel_threshold: workers: generations with less new chromosomes are
+        evaluated in the main process
+    :param islands: amount of islands to run the island model with. defaults to a
+        single population
+    :param migration_interval: island model: generations between migrations
+    :param migration_size: island model: top chromosomes each island sends
+    :param topology: island model: migration topology (ring / all)
+    :param jobs: amount of runs to execute in parallel. defaults to the cpu count
+    :param force: execute runs which already finished in a previous sweep
+    :param deadline: stop each run after this many seconds
+    :param max_evaluations: stop each run after this many fitness evaluations
+    :param max_generations: stop each run after this many generations
+    :param report_interval: record metrics every this many generations
+    :param compact: truncate chromosomes reaching the target to the genes they use
+    :param drop_bumps: also drop genes bumping into walls when compacting
+    :param batched: breed each generation at once on arrays instead of per child
+    :param selection: the selection method to use (ranking / tournament / sus)
+    :param profile: record the time spent in every phase of a generation in the
+        metrics
+    :param fitness: the fitness function to use: groups (distance ignoring walls,
+        in groups) / walking (length of the shortest path around walls)
+    :param seeding: the weight of every initialization method in the first
+        population, e.g. '{"random": 0.75, "descent": 0.25}'. methods: random /
+        walk (biased toward the target) / descent (down the walking distance) /
+        hint (mutated copies of the hint). defaults to random
+    :param hint: a path to seed the population with, as direction letters (U / D /
+        L / R). given alone, it is mixed in with the random seeding. seeding is
+        not used by the island model
+    :param adaptive: raise the mutation probabilities while the population stalls,
+        and restart part of it when it stalls for long
+    :param checkpoint_interval: save a checkpoint of each run every this many
+        generations, in its output directory. 0 never saves
+    :param resume: continue unfinished runs from their checkpoints
+    :param warm_start: path of a checkpoint to seed the first population of every
+        run with, e.g. of the same environment with another population size
     """
+    cache_budget = int(cache_mb * 2 ** 20) if cache_mb is not None else None
     env_items = ENVS.items()
     env_names = [env_name] if env_name else [env[0] for env in env_items]
     env_creators = [ENVS[env_name]] if env_name else [env[1] for env in env_items]
     pop_sizes = [pop_size] if pop_size else POPULATION_SIZES
-    sizes = [Size[size]] if size else list(Size)
-    for (env_name, env), pop_size, grid_size in itertools.product(
-        zip(env_names, env_creators), pop_sizes, sizes
-    ):
-        run_for_env(f"{env_name}-{grid_size.name}-{pop_size}", env, grid_size, pop_size)
+    sizes = [Size[size]] if size else SWEEP_SIZES
+    stop = DEFAULT_STOP_CRITERION
+    if deadline is not None:
+        stop |= Deadline(deadline)
+    if max_evaluations is not None:
+        stop |= EvaluationBudget(max_evaluations)
+    if max_generations is not None:
+        stop |= GenerationLimit(max_generations)
+
+    hint_chromosome = from_letters(hint) if hint is not None else None
+    if seeding is not None:
+        seeding = {
+            InitializationMethod(method): weight for method, weight in seeding.items()
+        }
+    elif hint is not None:
+        seeding = {InitializationMethod.RANDOM: 0.5, InitializationMethod.HINT: 0.5}
+
+    if islands:
+        runner = functools.partial(
+            run_islands_for_env,
+            islands=islands,
+            migration_interval=migration_interval,
+            migration_size=migration_size,
+            topology=Topology(topology),
+            fitness_class=FITNESSES[fitness],
+        )
+        suffix = "-islands"
+    else:
+        runner = functools.partial(
+            run_for_env,
+            cache_budget=cache_budget,
+            cache_policy=EvictionPolicy(cache_policy),
+            workers=workers,
+            batch_size=batch_size,
+            parallel_threshold=parallel_threshold,
+            stop=stop,
+            report_interval=report_interval,
+            compact=compact,
+            drop_bumps=drop_bumps,
+            batched=batched,
+            selection=SelectionMethod(selection),
+            profile=profile,
+            fitness_class=FITNESSES[fitness],
+            seeding=seeding,
+            hint=hint_chromosome,
+            adaptive=adaptive,
+            checkpoint_interval=checkpoint_interval,
+            resume=resume,
+            warm_start=warm_start,
+        )
+        suffix = ""
+
+    if map_path is not None:
+        map_name = os.path.splitext(os.path.basename(map_path))[0]
+        creator = functools.partial(map_env, map_path)
+        sweep_jobs = [
+            SweepJob(f"{map_name}-{pop_size}{suffix}", creator, None, pop_size)
+            for pop_size in pop_sizes
+        ]
+    else:
+        sweep_jobs = [
+            SweepJob(
+                f"{env_name}-{grid_size.name}-{pop_size}{suffix}",
+                env,
+                grid_size,
+                pop_size,
+            )
+            for (env_name, env), pop_size, grid_size in itertools.product(
+                zip(env_names, env_creators), pop_sizes, sizes
+            )
+        ]
+    SweepScheduler(runner, "out", jobs, force).run(sweep_jobs)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,122 @@
+"""
+Adapting the mutation probabilities to the progress of a run
+"""
+import math
+from typing import Sequence, Dict
+
+from path_finder.operators import Mutation
+from path_finder.population import Population
+
+
+class MutationController:
+    """
+    Tracks the top and median fitness and the diversity of every generation.
+    while they improve, the mutation probabilities return to their base values.
+    while they stall, the probabilities grow every `window` generations, and after
+    `restart_window` generations part of the population is replaced (see
+    Finder.restart)
+    """
+
+    DEFAULT_WINDOW = 25
+    DEFAULT_RESTART_WINDOW = 200
+    GROWTH = 1.5  # probability scale change of a stalled window
+    DECAY = 0.8  # probability scale change of an improving generation
+    MAX_SCALE = 16.0
+    MIN_DIVERSITY = 0.5  # a population with less unique chromosomes has converged
+    RESTART_FRACTION = 0.5  # part of the population replaced by a restart
+
+    def __init__(
+        self,
+        mutations: Sequence[Mutation],
+        window: int = DEFAULT_WINDOW,
+        restart_window: int = DEFAULT_RESTART_WINDOW,
+    ):
+        """
+        :param mutations: The mutations to adapt, their current probabilities are
+            the base ones
+        :param window: Amount of stalled generations between probability increases
+        :param restart_window: Amount of stalled generations before a restart. 0
+            never restarts
+        """
+        self.mutations = mutations
+        self.base_probabilities = [mutation.probability for mutation in mutations]
+        self.window = window
+        self.restart_window = restart_window
+        self.scale = 1.0
+        self.stalled = 0
+        self.restarts = 0
+        self.diversity = 1.0
+        self.top_fitness = -math.inf
+        self.median_fitness = -math.inf
+
+    def update(self, population: Population) -> bool:
+        """
+        Adapts the mutation probabilities to a new generation
+        :param population: The population of the generation
+        :return: True if the population should be partially restarted
+        """
+        # chromosomes often differ in genes they never get to use, so diversity is
+        # measured on the cells they end in
+        cells = {evaluation.cell for evaluation in population.evaluations}
+        self.diversity = len(cells) / population.population_length
+        improved = (
+            population.top_fitness > self.top_fitness
+            or population.median_fitness > self.median_fitness
+        )
+        self.top_fitness = max(self.top_fitness, population.top_fitness)
+        self.median_fitness = max(self.median_fitness, population.median_fitness)
+        if improved:
+            self.stalled = 0
+            self._set_scale(self.scale * self.DECAY)
+            return False
+
+        self.stalled += 1
+        if self.restart_window and self.stalled >= self.restart_window:
+            self.restarts += 1
+            self.stalled = 0
+            # the restarted population has a new median to improve on
+            self.median_fitness = -math.inf
+            self._set_scale(1.0)
+            return True
+
+        if self.stalled % self.window == 0:
+            # a converged population needs more than a nudge
+            growth = self.GROWTH
+            if self.diversity < self.MIN_DIVERSITY:
+                growth *= self.GROWTH
+            self._set_scale(self.scale * growth)
+
+        return False
+
+    def state(self) -> Dict[str, float]:
+        """
+        :return: The state of the controller, see load_state
+        """
+        return dict(
+            scale=self.scale,
+            stalled=self.stalled,
+            restarts=self.restarts,
+            diversity=self.diversity,
+            top_fitness=self.top_fitness,
+            median_fitness=self.median_fitness,
+        )
+
+    def load_state(self, state: Dict[str, float]) -> None:
+        """
+        Continues from the state of another controller
+        :param state: see state
+        """
+        self.stalled = state["stalled"]
+        self.restarts = state["restarts"]
+        self.diversity = state["diversity"]
+        self.top_fitness = state["top_fitness"]
+        self.median_fitness = state["median_fitness"]
+        self._set_scale(state["scale"])
+
+    def _set_scale(self, scale: float) -> None:
+        """
+        :param scale: The new mutation probabilities, relative to the base ones
+        """
+        self.scale = min(max(scale, 1.0), self.MAX_SCALE)
+        for mutation, probability in zip(self.mutations, self.base_probabilities):
+            mutation.probability = min(probability * self.scale, 1.0)
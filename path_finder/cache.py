@@ -0,0 +1,210 @@
+"""
+Bounded, instrumented caches used to memoize simulation results
+"""
+import abc
+import enum
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Hashable
+
+
+class EvictionPolicy(enum.Enum):
+    """
+    Available cache eviction policies
+    """
+
+    LRU = "lru"
+    CLOCK = "clock"
+
+
+@dataclass
+class CacheStats:
+    """
+    Counters of a cache's usage
+    """
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """
+        :return: the proportion of lookups that were hits
+        """
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class BoundedCache(abc.ABC):
+    """
+    A cache holding at most as many entries as fit in its byte budget
+    """
+
+    DEFAULT_ENTRY_SIZE = 200  # estimated bytes per entry, including dict overhead
+
+    def __init__(self, byte_budget: int, entry_size: int = DEFAULT_ENTRY_SIZE):
+        """
+        :param byte_budget: The amount of memory the cache may use, in bytes
+        :param entry_size: The estimated size of a single entry, in bytes
+        """
+        self.byte_budget = byte_budget
+        self.capacity = byte_budget // entry_size
+        self.stats = CacheStats()
+
+    @abc.abstractmethod
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        :param key: The key to look up
+        :param default: The value to return if the key is not cached
+        :return: The cached value
+        """
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def put(self, key: Hashable, value: Any) -> None:
+        """
+        Caches a value, evicting another entry if the cache is full
+        :param key: The key to cache the value under
+        :param value: The value to cache
+        """
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def __len__(self) -> int:
+        raise NotImplementedError()
+
+
+class LRUCache(BoundedCache):
+    """
+    A cache evicting the least recently used entry
+    """
+
+    def __init__(
+        self, byte_budget: int, entry_size: int = BoundedCache.DEFAULT_ENTRY_SIZE
+    ):
+        """
+        See BoundedCache.__init__
+        """
+        super().__init__(byte_budget, entry_size)
+        self._entries = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        See BoundedCache.get
+        """
+        try:
+            value = self._entries[key]
+        except KeyError:
+            self.stats.misses += 1
+            return default
+
+        self.stats.hits += 1
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """
+        See BoundedCache.put
+        """
+        if self.capacity == 0:
+            return
+
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class ClockCache(BoundedCache):
+    """
+    A cache approximating LRU with the CLOCK algorithm: a hit only sets a reference
+    bit, and eviction sweeps a hand over the slots clearing bits until it finds an
+    unreferenced one
+    """
+
+    def __init__(
+        self, byte_budget: int, entry_size: int = BoundedCache.DEFAULT_ENTRY_SIZE
+    ):
+        """
+        See BoundedCache.__init__
+        """
+        super().__init__(byte_budget, entry_size)
+        self._slots = {}
+        self._keys = []
+        self._values = []
+        self._referenced = bytearray()
+        self._hand = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        See BoundedCache.get
+        """
+        slot = self._slots.get(key)
+        if slot is None:
+            self.stats.misses += 1
+            return default
+
+        self.stats.hits += 1
+        self._referenced[slot] = 1
+        return self._values[slot]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """
+        See BoundedCache.put
+        """
+        slot = self._slots.get(key)
+        if slot is not None:
+            self._values[slot] = value
+            self._referenced[slot] = 1
+            return
+
+        if len(self._keys) < self.capacity:
+            self._slots[key] = len(self._keys)
+            self._keys.append(key)
+            self._values.append(value)
+            self._referenced.append(1)
+            return
+
+        if self.capacity == 0:
+            return
+
+        while self._referenced[self._hand]:
+            self._referenced[self._hand] = 0
+            self._hand = (self._hand + 1) % self.capacity
+
+        slot = self._hand
+        del self._slots[self._keys[slot]]
+        self._slots[key] = slot
+        self._keys[slot] = key
+        self._values[slot] = value
+        self._referenced[slot] = 1
+        self._hand = (slot + 1) % self.capacity
+        self.stats.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+CACHES = {
+    EvictionPolicy.LRU: LRUCache,
+    EvictionPolicy.CLOCK: ClockCache,
+}
+
+
+def create_cache(
+    byte_budget: int,
+    policy: EvictionPolicy = EvictionPolicy.LRU,
+    entry_size: int = BoundedCache.DEFAULT_ENTRY_SIZE,
+) -> BoundedCache:
+    """
+    :param byte_budget: The amount of memory the cache may use, in bytes
+    :param policy: The eviction policy to use
+    :param entry_size: The estimated size of a single entry, in bytes
+    :return: a new, empty cache
+    """
+    return CACHES[policy](byte_budget, entry_size)
@@ -0,0 +1,165 @@
+"""
+Checkpoints of a Finder, to resume an interrupted run or to warm-start a related one.
+
+A checkpoint is a compressed npz file holding the population with chromosomes
+packed to 2 bits per gene (see chromosome.to_packed), the evaluations as columns,
+and a json document of everything else: the generation, the random generator
+states, the mutation controller state and the Reporter cursor.
+"""
+import os
+import json
+import random
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from path_finder.chromosome import Chromosome, to_packed, from_packed
+from path_finder.finder import Finder
+from path_finder.fitness import Evaluation
+from path_finder.population import Population, RankedItem
+from path_finder.reporter import Reporter
+
+CHECKPOINT_FILE = "checkpoint.npz"
+FORMAT_VERSION = 1
+
+# the dtype of every evaluation column
+EVALUATION_DTYPES = {
+    "fitness": np.float64,
+    "cell": np.int64,
+    "distance": np.int64,
+    "steps": np.int64,
+    "hit_target": bool,
+}
+
+
+@dataclass
+class Checkpoint:
+    """
+    The state of a Finder at the start of a generation
+    """
+
+    generation: int
+    evaluation_count: int  # see Finder.evaluations
+    chromosomes: List[Chromosome]
+    evaluations: List[Evaluation]
+    best: RankedItem
+    random_state: tuple  # of `random`, see random.getstate
+    rng_state: Dict  # of Finder.rng, see numpy's BitGenerator.state
+    controller_state: Optional[Dict]  # see MutationController.state
+    reporter_cursor: Optional[Dict[str, int]]  # see Reporter.cursor
+
+    @classmethod
+    def capture(cls, finder: Finder, reporter: Reporter = None) -> "Checkpoint":
+        """
+        :param finder: The finder to capture
+        :param reporter: The finder's reporter, if any. its buffered states are
+            written to disk
+        :return: The current state of the finder
+        """
+        population = finder.population
+        return cls(
+            finder.generation,
+            finder.evaluations,
+            population.chromosomes,
+            population.evaluations,
+            finder.best,
+            random.getstate(),
+            finder.rng.bit_generator.state,
+            finder.controller.state() if finder.controller is not None else None,
+            reporter.cursor() if reporter is not None else None,
+        )
+
+    def save(self, path: str) -> None:
+        """
+        Writes the checkpoint. the file is replaced at once, so an interrupted save
+        leaves the previous checkpoint intact
+        :param path: The path of the checkpoint file
+        """
+        # the best chromosome is stored after the population, it may have been lost
+        genes, lengths = to_packed(self.chromosomes + [self.best.chromosome])
+        evaluations = self.evaluations + [self.best.evaluation]
+        version, internal_state, gauss_next = self.random_state
+        meta = dict(
+            version=FORMAT_VERSION,
+            generation=self.generation,
+            evaluation_count=self.evaluation_count,
+            best_fitness=self.best.fitness,
+            random_version=version,
+            random_gauss_next=gauss_next,
+            rng_state=self.rng_state,
+            controller_state=self.controller_state,
+            reporter_cursor=self.reporter_cursor,
+        )
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as f:
+            np.savez_compressed(
+                f,
+                meta=np.array(json.dumps(meta)),
+                genes=genes,
+                lengths=lengths,
+                random_state=np.array(internal_state, dtype=np.uint32),
+                **{
+                    name: np.array(column, dtype=EVALUATION_DTYPES[name])
+                    for name, column in zip(Evaluation._fields, zip(*evaluations))
+                },
+            )
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "Checkpoint":
+        """
+        :param path: The path of a checkpoint file
+        :return: The checkpoint
+        """
+        with np.load(path) as data:
+            meta = json.loads(data["meta"].item())
+            if meta["version"] != FORMAT_VERSION:
+                raise ValueError("unsupported checkpoint version", meta["version"])
+
+            chromosomes = from_packed(data["genes"], data["lengths"])
+            columns = [data[name].tolist() for name in Evaluation._fields]
+            random_state = tuple(data["random_state"].tolist())
+
+        evaluations = [Evaluation(*evaluation) for evaluation in zip(*columns)]
+        return cls(
+            meta["generation"],
+            meta["evaluation_count"],
+            chromosomes[:-1],
+            evaluations[:-1],
+            RankedItem(meta["best_fitness"], chromosomes[-1], evaluations[-1]),
+            (meta["random_version"], random_state, meta["random_gauss_next"]),
+            meta["rng_state"],
+            meta["controller_state"],
+            meta["reporter_cursor"],
+        )
+
+    def restore(self, finder: Finder) -> None:
+        """
+        Continues the run the checkpoint was captured from. the finder must have
+        been created with the same settings as that run's
+        :param finder: A new finder
+        """
+        finder.population = Population(
+            self.chromosomes, finder.fitness_func, self.evaluations
+        )
+        finder.best = self.best
+        finder.generation = self.generation
+        finder.fitness_func.evaluations = self.evaluation_count
+        random.setstate(self.random_state)
+        finder.rng.bit_generator.state = self.rng_state
+        if finder.controller is not None and self.controller_state is not None:
+            finder.controller.load_state(self.controller_state)
+
+    def warm_start(self, finder: Finder) -> None:
+        """
+        Seeds a related run (e.g. a different population size or fitness function
+        on the same environment) with the top chromosomes of the checkpoint. they
+        are evaluated again by the finder's fitness function
+        :param finder: A new finder
+        """
+        ranking = np.argsort(
+            [-evaluation.fitness for evaluation in self.evaluations], kind="stable"
+        )
+        count = min(len(ranking), finder.population.population_length)
+        finder.migrate([self.chromosomes[index] for index in ranking[:count].tolist()])
@@ -1,18 +1,152 @@
 """
-A chromosome used by the genetic algorithm
+A chromosome used by the genetic algorithm.
+
+Chromosomes are byte strings, every byte (gene) holds the index of a direction in
+DIRECTIONS. Direction objects are only used when pretty-printing.
+Chromosomes are immutable, so operators return their input as is when they leave it
+unchanged, and the same chromosome may be shared by several generations.
 """
 
 import typing
 import random
+import hashlib
+import numpy as np
+
+from path_finder.direction import Direction, DIRECTIONS, DIRECTION_INDEX
+
+Chromosome = bytes
 
-from path_finder.direction import Direction, DIRECTIONS
+GENES = range(len(DIRECTIONS))
 
-Chromosome = typing.Sequence[Direction]
+
+def random_gene() -> int:
+    """
+    :return: a random gene (direction index)
+    """
+    return random.choice(GENES)
 
 
-def random_chromosome(size: int):
+def random_chromosome(size: int) -> Chromosome:
     """
     :param size: the length for the chromosome to build
     :return: a randomly built chromosome
     """
-    return random.choices(DIRECTIONS, k=size)
+    return bytes(random.choices(GENES, k=size))
+
+
+def digest(chrom: Chromosome) -> bytes:
+    """
+    :param chrom: the chromosome to digest
+    :return: a short digest identifying the chromosome, used as a cache key
+    """
+    return hashlib.blake2b(chrom, digest_size=16).digest()
+
+
+def to_directions(chrom: Chromosome) -> typing.List[Direction]:
+    """
+    :param chrom: the chromosome to decode
+    :return: the directions the chromosome encodes
+    """
+    return [DIRECTIONS[gene] for gene in chrom]
+
+
+def from_directions(directions: typing.Iterable[Direction]) -> Chromosome:
+    """
+    :param directions: the directions to encode
+    :return: a chromosome encoding the directions
+    """
+    return bytes(DIRECTION_INDEX[direction] for direction in directions)
+
+
+def from_letters(letters: str) -> Chromosome:
+    """
+    :param letters: the letters of the directions to encode, e.g. "UURD"
+    :return: a chromosome encoding the directions
+    """
+    letter_index = {direction.letter: i for i, direction in enumerate(DIRECTIONS)}
+    try:
+        return bytes(letter_index[letter] for letter in letters.upper())
+    except KeyError as e:
+        raise ValueError("unknown direction letter", e.args[0]) from None
+
+
+def to_array(
+    chroms: typing.Sequence[Chromosome],
+) -> typing.Tuple[np.ndarray, np.ndarray]:
+    """
+    Packs a group of chromosomes into a padded array of direction indices
+    :param chroms: the chromosomes to pack
+    :return: a (len(chroms), max length) array of direction indices, and a vector of
+        the chromosome lengths. padding cells are zero and must be masked by length
+    """
+    lengths = np.fromiter(
+        (len(chrom) for chrom in chroms), dtype=np.int64, count=len(chroms)
+    )
+    steps = np.zeros((len(chroms), lengths.max(initial=0)), dtype=np.uint8)
+    steps[np.arange(steps.shape[1]) < lengths[:, None]] = np.frombuffer(
+        b"".join(chroms), dtype=np.uint8
+    )
+
+    return steps, lengths
+
+
+# a group of chromosomes as one flat array of genes, and the offsets where each
+# chromosome starts (the last offset is where the last chromosome ends)
+FlatChromosomes = typing.Tuple[np.ndarray, np.ndarray]
+
+
+def to_flat(chroms: typing.Sequence[Chromosome]) -> FlatChromosomes:
+    """
+    :param chroms: the chromosomes to pack
+    :return: the chromosomes as a flat array of genes and offsets
+    """
+    offsets = np.zeros(len(chroms) + 1, dtype=np.int64)
+    np.cumsum([len(chrom) for chrom in chroms], out=offsets[1:])
+    return np.frombuffer(b"".join(chroms), dtype=np.uint8), offsets
+
+
+def from_flat(genes: np.ndarray, offsets: np.ndarray) -> typing.List[Chromosome]:
+    """
+    :param genes: a flat array of genes
+    :param offsets: where each chromosome starts in the genes
+    :return: the chromosomes
+    """
+    data = genes.astype(np.uint8, copy=False).tobytes()
+    bounds = offsets.tolist()
+    return [data[start:end] for start, end in zip(bounds, bounds[1:])]
+
+
+# DIRECTIONS has 4 directions, so a gene fits in 2 bits
+PACKED_GENE_BITS = 2
+GENES_PER_BYTE = 8 // PACKED_GENE_BITS
+_PACKED_SHIFTS = np.arange(0, 8, PACKED_GENE_BITS, dtype=np.uint8)
+
+
+def to_packed(
+    chroms: typing.Sequence[Chromosome],
+) -> typing.Tuple[np.ndarray, np.ndarray]:
+    """
+    Packs a group of chromosomes into 2 bits per gene, for storage
+    :param chroms: the chromosomes to pack
+    :return: the genes of all the chromosomes, 4 in every byte starting at the low
+        bits, and a vector of the chromosome lengths
+    """
+    genes, offsets = to_flat(chroms)
+    padded = np.zeros(-(-len(genes) // GENES_PER_BYTE) * GENES_PER_BYTE, np.uint8)
+    padded[: len(genes)] = genes
+    packed = np.bitwise_or.reduce(
+        padded.reshape(-1, GENES_PER_BYTE) << _PACKED_SHIFTS, axis=1
+    ).astype(np.uint8)
+    return packed, np.diff(offsets)
+
+
+def from_packed(packed: np.ndarray, lengths: np.ndarray) -> typing.List[Chromosome]:
+    """
+    :param packed: the packed genes, see to_packed
+    :param lengths: the length of every chromosome
+    :return: the chromosomes
+    """
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    genes = (packed[:, np.newaxis] >> _PACKED_SHIFTS) & (len(GENES) - 1)
+    return from_flat(genes.reshape(-1)[: offsets[-1]], offsets)
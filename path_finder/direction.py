@@ -30,6 +30,7 @@ class Direction(enum.Enum):
 
 
 DIRECTIONS = list(Direction)
+DIRECTION_INDEX = {direction: i for i, direction in enumerate(DIRECTIONS)}
 
 
 def random_direction() -> Direction:
@@ -3,7 +3,11 @@ Different preset environments to test with
 """
 import enum
 import math
-from path_finder.grid import Cell, Grid, GridWrapper
+from typing import Union
+
+import numpy as np
+
+from path_finder.grid import GridWrapper
 from path_finder.point import Point
 
 
@@ -15,98 +19,106 @@ class Size(enum.Enum):
     SMALL = 10
     MEDIUM = 30
     LARGE = 50
+    HUGE = 1000
+
+
+# the sizes experiment sweeps run on by default
+SWEEP_SIZES = [Size.SMALL, Size.MEDIUM, Size.LARGE]
 
 
-def _create_env(size: Size) -> Grid:
+def _side(size: Union[Size, int]) -> int:
+    """
+    :param size: A preset size, or the side of the grid in cells
+    :return: The side of the grid in cells
+    """
+    return size.value if isinstance(size, Size) else size
+
+
+def _create_env(size: Union[Size, int]) -> np.ndarray:
     """
     Creates an empty grid
     :param size: The size of the grid to create
-    :return: an empty grid of the specified size
+    :return: the obstacles of an empty grid of the specified size, see
+        GridWrapper.from_blocked
     """
-    return [[Cell() for _ in range(size.value)] for _ in range(size.value)]
+    side = _side(size)
+    return np.zeros((side, side), dtype=bool)
 
 
-def empty_env(size: Size) -> GridWrapper:
+def empty_env(size: Union[Size, int]) -> GridWrapper:
     """
     Returns a default empty environment
     :param size: The size of the environment to create
     :return: an empty environment of the specified size
     """
-    grid = _create_env(size)
-    return GridWrapper(grid, Point(0, 0), Point(size.value - 1, size.value - 1))
+    blocked = _create_env(size)
+    side = len(blocked)
+    return GridWrapper.from_blocked(blocked, Point(0, 0), Point(side - 1, side - 1))
 
 
-def center_block_env(size: Size, percentage=0.25) -> Grid:
+def center_block_env(size: Union[Size, int], percentage=0.25) -> GridWrapper:
     """
     An environment with a block in the middle
     """
-    block_size = (size.value ** 2) * percentage
+    blocked = _create_env(size)
+    side = len(blocked)
+    block_size = (side ** 2) * percentage
     side_size = math.sqrt(block_size)
     half_size_size = int(side_size // 2)
-    grid = _create_env(size)
-    for i in range(size.value // 2 - half_size_size, size.value // 2 + half_size_size):
-        for j in range(
-            size.value // 2 - half_size_size, size.value // 2 + half_size_size
-        ):
-            grid[i][j].blocked = True
-    return GridWrapper(grid, Point(0, 0), Point(size.value - 1, size.value - 1))
+    block = slice(side // 2 - half_size_size, side // 2 + half_size_size)
+    blocked[block, block] = True
+    return GridWrapper.from_blocked(blocked, Point(0, 0), Point(side - 1, side - 1))
 
 
-def peekhole_env(size: Size) -> Grid:
+def peekhole_env(size: Union[Size, int]) -> GridWrapper:
     """
     An environment with a row full of blocks except fro the middle cell
     """
-    grid = _create_env(size)
-    for i in range(0, size.value):
-        if i != size.value // 2:
-            grid[size.value // 2][i].blocked = True
-
-    return GridWrapper(grid, Point(0, 0), Point(size.value - 1, size.value - 1))
+    blocked = _create_env(size)
+    side = len(blocked)
+    blocked[side // 2, :] = True
+    blocked[side // 2, side // 2] = False
+    return GridWrapper.from_blocked(blocked, Point(0, 0), Point(side - 1, side - 1))
 
 
-def wall_env(size: Size, space_prec: float = 0.25) -> Grid:
+def wall_env(size: Union[Size, int], space_prec: float = 0.25) -> GridWrapper:
     """
     An environment where the robot has to go around a wall
     """
-    grid = _create_env(size)
-    for i in range(math.floor(space_prec * size.value), size.value):
-        grid[size.value // 2][i].blocked = True
-
-    return GridWrapper(
-        grid, Point(size.value - 1, 0), Point(size.value - 1, size.value - 1)
+    blocked = _create_env(size)
+    side = len(blocked)
+    blocked[side // 2, math.floor(space_prec * side) :] = True
+    return GridWrapper.from_blocked(
+        blocked, Point(side - 1, 0), Point(side - 1, side - 1)
     )
 
 
-def multi_wall_env(size: Size, space_prec: float = 0.25) -> Grid:
+def multi_wall_env(size: Union[Size, int], space_prec: float = 0.25) -> GridWrapper:
     """
     An environment where the robot has to go around multiple walls
     """
-    grid = _create_env(size)
-    for i in range(math.floor(space_prec * size.value), size.value):
-        grid[size.value // 4][i].blocked = True
-        grid[size.value // 2][i].blocked = True
-        grid[3 * size.value // 4][i].blocked = True
-
-    return GridWrapper(
-        grid, Point(size.value - 1, 0), Point(size.value - 1, size.value - 1)
+    blocked = _create_env(size)
+    side = len(blocked)
+    walls = [side // 4, side // 2, 3 * side // 4]
+    blocked[walls, math.floor(space_prec * side) :] = True
+    return GridWrapper.from_blocked(
+        blocked, Point(side - 1, 0), Point(side - 1, side - 1)
     )
 
 
-def multiway_wall_env(size: Size, space_prec: float = 0.25) -> Grid:
+def multiway_wall_env(
+    size: Union[Size, int], space_prec: float = 0.25
+) -> GridWrapper:
     """
     An environment where the robot has to go around multiple walls in multiple
     directions
     """
-    grid = _create_env(size)
-    for i in range(math.floor(space_prec * size.value), size.value):
-        grid[size.value // 4][i].blocked = True
-        grid[3 * size.value // 4][i].blocked = True
-
-    for i in range(0, size.value - math.floor(space_prec * size.value)):
-        grid[size.value // 2][i].blocked = True
-
-    return GridWrapper(
-        grid, Point(size.value - 1, 0), Point(size.value - 1, size.value - 1)
+    blocked = _create_env(size)
+    side = len(blocked)
+    blocked[[side // 4, 3 * side // 4], math.floor(space_prec * side) :] = True
+    blocked[side // 2, : side - math.floor(space_prec * side)] = True
+    return GridWrapper.from_blocked(
+        blocked, Point(side - 1, 0), Point(side - 1, side - 1)
     )
 
 
@@ -1,8 +1,14 @@
 """
 The path finder, used to run the genetic algorithm
 """
-import copy
-from typing import Type
+import math
+import time
+import random
+from dataclasses import dataclass
+from typing import Type, Sequence, Callable, List
+
+import numpy as np
+
 from path_finder.grid import GridWrapper
 from path_finder.operators import (
     PathFinderChoose,
@@ -14,11 +20,36 @@ from path_finder.operators import (
     PathFinderOperationSequence,
 )
 
+from path_finder.adaptation import MutationController
 from path_finder.fitness import Fitness
-from path_finder.chromosome import random_chromosome
+from path_finder.parallel import ParallelEvaluator
+from path_finder.chromosome import Chromosome
+from path_finder.initializer import (
+    SeedingMix,
+    DEFAULT_SEEDING,
+    create_initializer,
+    seed_counts,
+)
 from path_finder.point import distance
-from path_finder.population import Population
-from path_finder.selector import RankingSelector
+from path_finder.population import Population, RankedItem
+from path_finder.profiling import PhaseTimer
+from path_finder.selector import Selector, RankingSelector
+from path_finder.stop import StopCriterion
+
+
+@dataclass
+class FinderResult:
+    """
+    The best chromosome a Finder found so far
+    """
+
+    chromosome: Chromosome
+    fitness: float
+    distance: int
+    generation: int
+    evaluations: int
+    elapsed: float  # seconds spent in Finder.run
+    reason: str  # why the run stopped
 
 
 class Finder:
@@ -27,14 +58,48 @@ class Finder:
     """
 
     ELITISM_FACTOR = 0.05
+    SEEDING_FACTOR = 2  # size of the first population, relative to the others
 
     def __init__(
-        self, grid: GridWrapper, population_size: int, fitness_class: Type[Fitness]
+        self,
+        grid: GridWrapper,
+        population_size: int,
+        fitness_class: Type[Fitness],
+        workers: int = 0,
+        batch_size: int = ParallelEvaluator.DEFAULT_BATCH_SIZE,
+        parallel_threshold: int = ParallelEvaluator.DEFAULT_THRESHOLD,
+        compact: bool = False,
+        drop_bumps: bool = False,
+        batched: bool = False,
+        selector_class: Type[Selector] = RankingSelector,
+        profile: bool = False,
+        seeding: SeedingMix = None,
+        hint: Chromosome = None,
+        adaptive: bool = False,
     ):
         """
         :param grid: The environment to run the algorithm on
         :param population_size: The size of the population to generate
         :param fitness_class: The fitness function to use
+        :param workers: Amount of processes to evaluate fitness on. 0 evaluates in
+            the current process, None uses all cpus
+        :param batch_size: see ParallelEvaluator.__init__
+        :param parallel_threshold: see ParallelEvaluator.__init__
+        :param compact: If true, chromosomes reaching the target are truncated to
+            the genes they use every generation
+        :param drop_bumps: If true, compaction also drops genes which bump into
+            walls. see GridWrapper.compact
+        :param batched: If true, each generation is bred at once on arrays, see
+            PathFinderOperationSequence.breed
+        :param selector_class: The selection method to use
+        :param profile: If true, the phases of every generation are timed, see timer
+        :param seeding: The weight of every initialization method in the first
+            population. defaults to DEFAULT_SEEDING
+        :param hint: A path to seed the population with, used by the HINT
+            initialization method
+        :param adaptive: If true, the mutation probabilities follow the progress of
+            the run, and stalled populations are partially restarted. see
+            MutationController
         """
         self.grid = grid
         self.min_dist = distance(grid.start, grid.target)
@@ -49,33 +114,215 @@ class Finder:
             ],
         )
         self.population_size = population_size
+        self.compact = compact
+        self.drop_bumps = drop_bumps
+        self.batched = batched
+        self.selector_class = selector_class
+        # the durations and counters of the last generation
+        self.timer = PhaseTimer(profile)
+        # seeded from `random`, so seeding it makes batched runs reproducible too
+        self.rng = np.random.default_rng(random.getrandbits(64))
         self.fitness_func = fitness_class(grid)
-        self.population = Population(
-            [random_chromosome(self.min_dist) for _ in range(self.population_size)]
-            + [
-                random_chromosome(self.min_dist * 2)
-                for _ in range(self.population_size)
-            ],
-            self.fitness_func,
+        if workers != 0:
+            self.fitness_func.evaluator = ParallelEvaluator(
+                self.fitness_func, workers, batch_size, parallel_threshold
+            )
+        seeding = seeding or DEFAULT_SEEDING
+        self.initializers = [
+            create_initializer(method, grid, hint) for method in seeding
+        ]
+        self.seeding_weights = list(seeding.values())
+        self.controller = (
+            MutationController(self.operations.mutations) if adaptive else None
         )
+        self.best: RankedItem = None
         self.generation = 0
+        self._set_population(
+            Population(
+                self._seed(self.population_size * self.SEEDING_FACTOR),
+                self.fitness_func,
+            )
+        )
+
+    def _seed(self, count: int) -> List[Chromosome]:
+        """
+        :param count: Amount of chromosomes to create
+        :return: New chromosomes, split between the initializers by their weight
+        """
+        chroms = []
+        counts = seed_counts(self.seeding_weights, count)
+        for initializer, initializer_count in zip(self.initializers, counts):
+            chroms.extend(initializer.create(initializer_count, self.rng))
+
+        return chroms
+
+    @property
+    def evaluations(self) -> int:
+        """
+        :return: The amount of chromosomes simulated by the fitness function
+        """
+        return self.fitness_func.evaluations
+
+    def _set_population(self, population: Population) -> None:
+        """
+        Replaces the population, keeping track of the best chromosome seen
+        :param population: The new population
+        """
+        self.population = population
+        if self.best is None or population.top_fitness > self.best.fitness:
+            self.best = population.item(population.top_index)
 
     def run_generation(self) -> None:
         """
         makes an iteration: mates parents and creates a new generation of children
         """
-        new_items = []
+        timer = self.timer
+        timer.reset()
+        evaluations_before = self.fitness_func.evaluations
+        cache_hits_before = self.grid.cache.stats.hits
+
+        # elitism. chromosomes are immutable, so the top one and its evaluation are
+        # shared rather than copied
+        with timer.phase("elitism"):
+            elite_count = math.ceil(self.population_size * self.ELITISM_FACTOR)
+            new_items = [self.population.top_item] * elite_count
+            evaluations = [self.population.top_evaluation] * elite_count
 
-        # elitism
-        while len(new_items) < self.population_size * self.ELITISM_FACTOR:
-            new_items.append(copy.deepcopy(self.population.top_item))
+        # includes ranking the population, for selectors that need it
+        with timer.phase("selection"):
+            remaining_count = self.population_size - len(new_items)
+            selector = self.selector_class(self.population)
+            parents1, parents2 = selector.select(remaining_count, self.rng)
 
-        remaining_count = self.population_size - len(new_items)
-        selector = RankingSelector(self.population)
-        couples = selector.select(remaining_count)
-        for parent1, parent2 in couples:
-            new_item = self.operations(parent1, parent2)
-            new_items.append(new_item)
+        items = self.population.chromosomes
+        if self.batched:
+            children = self.operations.breed(items, parents1, parents2, self.rng, timer)
+        else:
+            children = self.operations.breed_each(items, parents1, parents2, timer)
+
+        with timer.phase("evaluation"):
+            new_items.extend(children)
+            evaluations.extend(self.fitness_func.evaluate(children))
+
+        with timer.phase("population"):
+            population = Population(new_items, self.fitness_func, evaluations)
+
+        if self.compact:
+            with timer.phase("compaction"):
+                population = self._compacted(population)
+
+        if timer.enabled:
+            evaluations_count = self.fitness_func.evaluations - evaluations_before
+            timer.count("evaluations", evaluations_count)
+            timer.count("cache_hits", self.grid.cache.stats.hits - cache_hits_before)
+            timer.count("genes", sum(map(len, children)))
+
+        self._set_population(population)
+        if self.controller is not None:
+            with timer.phase("adaptation"):
+                if self.controller.update(population):
+                    self.restart(self.controller.RESTART_FRACTION)
 
-        self.population = Population(new_items, self.fitness_func)
         self.generation += 1
+
+    def _compacted(self, population: Population) -> Population:
+        """
+        :param population: The population to compact
+        :return: The population, with chromosomes reaching the target truncated to
+            the genes they use
+        """
+        items = []
+        evaluations = []
+        for chrom, evaluation in zip(population.chromosomes, population.evaluations):
+            if evaluation.hit_target:
+                compacted = self.grid.compact(chrom, evaluation.steps, self.drop_bumps)
+                if len(compacted) != len(chrom):
+                    chrom = compacted
+                    evaluation = self.fitness_func.rescore(evaluation, len(chrom))
+
+            items.append(chrom)
+            evaluations.append(evaluation)
+
+        return Population(items, self.fitness_func, evaluations)
+
+    def result(self, reason: str = "", elapsed: float = 0.0) -> FinderResult:
+        """
+        :param reason: see FinderResult
+        :param elapsed: see FinderResult
+        :return: the best chromosome found so far
+        """
+        return FinderResult(
+            self.best.chromosome,
+            self.best.fitness,
+            self.best.evaluation.distance,
+            self.generation,
+            self.evaluations,
+            elapsed,
+            reason,
+        )
+
+    def run(
+        self,
+        stop: StopCriterion,
+        on_generation: Callable[["Finder"], None] = None,
+    ) -> FinderResult:
+        """
+        Runs generations until the stop criterion is met
+        :param stop: When to stop. see the stop module
+        :param on_generation: called with the finder on the initial generation and
+            after every generation
+        :return: the best chromosome found
+        """
+        start_time = time.monotonic()
+        stop.start(self)
+        while True:
+            if on_generation is not None:
+                on_generation(self)
+
+            if stop(self):
+                break
+
+            self.run_generation()
+
+        return self.result(str(stop), time.monotonic() - start_time)
+
+    def migrate(self, immigrants: Sequence[Chromosome]) -> None:
+        """
+        Replaces the chromosomes with the lowest fitness with the given chromosomes
+        :param immigrants: Chromosomes coming from another population
+        """
+        if not immigrants:
+            return
+
+        population = self.population
+        kept = population.elite_indices(
+            max(population.population_length - len(immigrants), 0)
+        ).tolist()
+        self._set_population(
+            Population(
+                [population.chromosomes[index] for index in kept] + list(immigrants),
+                self.fitness_func,
+            )
+        )
+
+    def restart(self, fraction: float) -> None:
+        """
+        Replaces the chromosomes with the lowest fitness with new ones, created by
+        the initializers
+        :param fraction: The part of the population to replace
+        """
+        self.migrate(self._seed(int(self.population.population_length * fraction)))
+
+    def close(self) -> None:
+        """
+        Releases the parallel evaluation workers, if any
+        """
+        if self.fitness_func.evaluator is not None:
+            self.fitness_func.evaluator.close()
+            self.fitness_func.evaluator = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
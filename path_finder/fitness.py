@@ -3,9 +3,21 @@ Various fitness functions to control the specimen selection in the reproduction
 """
 import abc
 import math
-from path_finder.chromosome import Chromosome
+from collections import namedtuple
+from typing import Sequence, List
+from path_finder.cache import BoundedCache, create_cache
+from path_finder.chromosome import Chromosome, digest, to_array
 from path_finder.grid import GridWrapper
-from path_finder.point import distance
+
+DEFAULT_MEMO_BUDGET = 16 * 2 ** 20  # bytes
+
+# the outcome of evaluating a chromosome:
+#   fitness: the chromosome's fitness
+#   cell: the cell the chromosome stops in
+#   distance: the distance of that cell from the target
+#   steps: the amount of genes used until stopping
+#   hit_target: whether the chromosome reached the target
+Evaluation = namedtuple("Evaluation", "fitness cell distance steps hit_target")
 
 
 class Fitness(abc.ABC):
@@ -13,19 +25,119 @@ class Fitness(abc.ABC):
     A fitness function
     """
 
-    def __init__(self, grid: GridWrapper):
+    def __init__(self, grid: GridWrapper, memo: BoundedCache = None):
         """
         :param grid: The environment we use
+        :param memo: cache of already evaluated chromosomes, kept across
+            generations. defaults to an LRU cache of DEFAULT_MEMO_BUDGET bytes
         """
         self.grid = grid
         self.grid_size = grid.grid_x_size * grid.grid_y_size
+        self.memo = memo if memo is not None else create_cache(DEFAULT_MEMO_BUDGET)
+        # optional parallel backend, see parallel.ParallelEvaluator
+        self.evaluator = None
+        self.evaluations = 0  # amount of chromosomes simulated
 
-    @abc.abstractmethod
     def __call__(self, chrom: Chromosome) -> float:
         """
         :param chrom: The chromosome to calculate the fitness of
         :return: The fitness of the chromosome
         """
+        return self.evaluate_one(chrom).fitness
+
+    def evaluate_one(self, chrom: Chromosome) -> Evaluation:
+        """
+        :param chrom: The chromosome to evaluate
+        :return: The evaluation of the chromosome
+        """
+        cell, steps = self.grid.simulate(chrom)
+        return self._evaluation(cell, steps, len(chrom))
+
+    def evaluate(self, chroms: Sequence[Chromosome]) -> List[Evaluation]:
+        """
+        Evaluates a group of chromosomes. chromosomes which were already evaluated
+        are looked up in the memo, the rest are simulated in a single batch
+        :param chroms: The chromosomes to evaluate
+        :return: The evaluation of each chromosome
+        """
+        keys = [digest(chrom) for chrom in chroms]
+        results = [self.memo.get(key) for key in keys]
+        missing = {}  # key -> chromosome, drops clones within the batch
+        for key, chrom, result in zip(keys, chroms, results):
+            if result is None:
+                missing[key] = chrom
+
+        if not missing:
+            return results
+
+        chroms = list(missing.values())
+        self.evaluations += len(chroms)
+        if self.evaluator is not None and len(chroms) >= self.evaluator.threshold:
+            fresh = self.evaluator.evaluate(chroms)
+        else:
+            fresh = self._evaluate(chroms)
+
+        for key, result in zip(missing, fresh):
+            self.memo.put(key, result)
+            missing[key] = result
+
+        return [
+            missing[key] if result is None else result
+            for key, result in zip(keys, results)
+        ]
+
+    def _evaluate(self, chroms: Sequence[Chromosome]) -> List[Evaluation]:
+        """
+        Evaluates a group of chromosomes using a single batch simulation
+        :param chroms: The chromosomes to evaluate
+        :return: The evaluation of each chromosome
+        """
+        steps, lengths = to_array(chroms)
+        cells, used = self.grid.simulate_population(steps, lengths)
+        return [
+            self._evaluation(cell, used_steps, length)
+            for cell, used_steps, length in zip(
+                cells.tolist(), used.tolist(), lengths.tolist()
+            )
+        ]
+
+    def rescore(self, evaluation: Evaluation, length: int) -> Evaluation:
+        """
+        Evaluates a chromosome compacted to a given length, which stops in the same
+        cell. see GridWrapper.compact
+        :param evaluation: The evaluation of the original chromosome
+        :param length: The length of the compacted chromosome
+        :return: The evaluation of the compacted chromosome
+        """
+        return evaluation._replace(
+            fitness=self.score(evaluation.distance, length),
+            steps=min(evaluation.steps, length),
+        )
+
+    def _evaluation(self, cell: int, steps: int, length: int) -> Evaluation:
+        """
+        :param cell: The cell the chromosome stops in
+        :param steps: The amount of genes used until stopping
+        :param length: The length of the chromosome
+        :return: The evaluation of the chromosome
+        """
+        dist = self.cell_distance(cell)
+        return Evaluation(self.score(dist, length), cell, dist, steps, dist == 0)
+
+    def cell_distance(self, cell: int) -> int:
+        """
+        :param cell: A cell index
+        :return: The distance of the cell from the target, as scored
+        """
+        return self.grid.cell_distance(cell)
+
+    @abc.abstractmethod
+    def score(self, dist: int, length: int) -> float:
+        """
+        :param dist: The distance from the target the chromosome stops in
+        :param length: The length of the chromosome
+        :return: The fitness of the chromosome
+        """
         raise NotImplementedError()
 
 
@@ -34,15 +146,11 @@ class NaiveFitness(Fitness):
     A Naive fitness functions that converges fast when it hits a wall
     """
 
-    def __call__(self, chrom: Chromosome) -> float:
+    def score(self, dist: int, length: int) -> float:
         """
-        see: Fitness.__call__
+        see: Fitness.score
         """
-        return (
-            self.grid_size
-            - distance(self.grid.simulate_movement(chrom), self.grid.target)
-            - (len(chrom) / self.grid_size)
-        )
+        return self.grid_size - dist - (length / self.grid_size)
 
 
 class PathFinderFitnessNoLengthPenalty(Fitness):
@@ -50,15 +158,14 @@ class PathFinderFitnessNoLengthPenalty(Fitness):
     A fitness function that only looks at chromosome length once we hit the target
     """
 
-    def __call__(self, chrom: Chromosome) -> float:
+    def score(self, dist: int, length: int) -> float:
         """
-        see: Fitness.__call__
+        see: Fitness.score
         """
-        dist = distance(self.grid.simulate_movement(chrom), self.grid.target)
         if dist != 0:
             return self.grid_size - dist
         else:
-            return self.grid_size - (len(chrom) / self.grid_size)
+            return self.grid_size - (length / self.grid_size)
 
 
 class PathFinderFitnessRewardLength(Fitness):
@@ -67,16 +174,15 @@ class PathFinderFitnessRewardLength(Fitness):
     not hit the target
     """
 
-    def __call__(self, chrom: Chromosome) -> float:
+    def score(self, dist: int, length: int) -> float:
         """
-        see: Fitness.__call__
+        see: Fitness.score
         """
-        dist = distance(self.grid.simulate_movement(chrom), self.grid.target)
         if dist != 0:
-            return self.grid_size - dist + min((len(chrom) / self.grid_size), 0.2)
+            return self.grid_size - dist + min((length / self.grid_size), 0.2)
         else:
             # reward extra 1 for destination to make that beat length reward
-            return self.grid_size + 1 - (len(chrom) / self.grid_size)
+            return self.grid_size + 1 - (length / self.grid_size)
 
 
 class PathFinderFitnessRewardLengthDistanceGroups(Fitness):
@@ -92,21 +198,20 @@ class PathFinderFitnessRewardLengthDistanceGroups(Fitness):
     def dist_group_length(self) -> int:
         return self.grid.grid_x_size // self.DISTANCE_GROUPS_IN_AXIS
 
-    def __call__(self, chrom: Chromosome) -> float:
+    def score(self, dist: int, length: int) -> float:
         """
-        see: Fitness.__call__
+        see: Fitness.score
         """
-        dist = distance(self.grid.simulate_movement(chrom), self.grid.target)
         if dist != 0:
             return (
                 self.grid_size
                 - math.ceil(dist / self.dist_group_length)
-                + min((len(chrom) / self.grid_size), 0.2)
+                + min((length / self.grid_size), 0.2)
             )
         else:
             # reward extra 1 for destination to make that beat length reward
             return (
-                self.grid_size + self.dist_group_length - (len(chrom) / self.grid_size)
+                self.grid_size + self.dist_group_length - (length / self.grid_size)
             )
 
 
@@ -123,13 +228,12 @@ class PathFinderFitnessRewardLengthDistanceGroupsWithLimit(Fitness):
     def dist_group_length(self) -> int:
         return self.grid.grid_x_size // self.DISTANCE_GROUPS_IN_AXIS
 
-    def __call__(self, chrom: Chromosome) -> float:
+    def score(self, dist: int, length: int) -> float:
         """
-        see: Fitness.__call__
+        see: Fitness.score
         """
-        dist = distance(self.grid.simulate_movement(chrom), self.grid.target)
         if dist != 0:
-            chrom_len_prop = len(chrom) / self.grid_size
+            chrom_len_prop = length / self.grid_size
             if chrom_len_prop > 0.5:
                 # maintain a reasonable length chrom for performance reasons
                 return self.grid_size - math.ceil(dist / self.dist_group_length)
@@ -142,5 +246,43 @@ class PathFinderFitnessRewardLengthDistanceGroupsWithLimit(Fitness):
         else:
             # reward extra 1 for destination to make that beat length reward
             return (
-                self.grid_size + self.dist_group_length - (len(chrom) / self.grid_size)
+                self.grid_size + self.dist_group_length - (length / self.grid_size)
             )
+
+
+class PathFinderFitnessWalkingDistance(Fitness):
+    """
+    A fitness function that scores the length of the shortest path around obstacles
+    from where the chromosome stops to the target (see
+    GridWrapper.walking_distance), rather than the distance ignoring walls, so
+    chromosomes stuck behind a wall do not look close to the target.
+    rewards long chromosomes over short chromosomes which do not hit the target.
+    """
+
+    def __init__(self, grid: GridWrapper, memo: BoundedCache = None):
+        """
+        see: Fitness.__init__
+        """
+        super().__init__(grid, memo)
+        self._walking_distance = memoryview(grid.walking_distance)
+
+    def cell_distance(self, cell: int) -> int:
+        """
+        see: Fitness.cell_distance
+        """
+        return self._walking_distance[cell]
+
+    def score(self, dist: int, length: int) -> float:
+        """
+        see: Fitness.score
+        """
+        if dist != 0:
+            chrom_len_prop = length / self.grid_size
+            if chrom_len_prop > 0.5:
+                # maintain a reasonable length chrom for performance reasons
+                return self.grid_size - dist
+
+            return self.grid_size - dist + min(chrom_len_prop, 0.2)
+        else:
+            # reward extra 1 for destination to make that beat length reward
+            return self.grid_size + 1 - (length / self.grid_size)
@@ -1,14 +1,14 @@
 """
 The grid the robot is moving on
 """
-from typing import Sequence, Iterable
-from itertools import islice
-from path_finder.direction import Direction
-from path_finder.chromosome import Chromosome
+from typing import Sequence, Dict, Tuple
+import numpy as np
+from path_finder.direction import DIRECTIONS
+from path_finder.chromosome import Chromosome, to_array, to_directions
 from terminaltables import SingleTable
-from methodtools import lru_cache
 
-from path_finder.point import Point, distance
+from path_finder.cache import BoundedCache, create_cache
+from path_finder.point import Point
 
 
 class Cell:
@@ -18,10 +18,53 @@ class Cell:
 
 Grid = Sequence[Sequence[Cell]]
 
+# movement of each direction index, see chromosome.to_array
+DIRECTION_X = np.array([direction.x for direction in DIRECTIONS])
+DIRECTION_Y = np.array([direction.y for direction in DIRECTIONS])
+DIRECTION_COUNT = len(DIRECTIONS)
 
-def chunk(it: Iterable, size: int) -> Iterable:
-    it = iter(it)
-    return iter(lambda: tuple(islice(it, size)), ())
+SIMULATION_CHUNK_SIZE = 25  # at most 32, the genes of a chunk key fit in 64 bits
+# chunks missing the cache are simulated one by one when there are fewer of them,
+# a lockstep step costs about as much as a few dozen scalar steps
+SCALAR_SIMULATION_ROWS = 32
+DEFAULT_CACHE_BUDGET = 64 * 2 ** 20  # bytes
+
+
+_CHUNK_SHIFTS = np.arange(0, 64, 2, dtype=np.uint64)
+_MASK_64 = 2 ** 64 - 1
+# packs the bytes of a chunk, read as a little endian int, to 2 bits per gene. every
+# step merges pairs of neighbouring fields into fields twice as wide, see _chunk_key
+_PACK_STEPS = [
+    (
+        6 << level,
+        sum(((1 << (4 << level)) - 1) << group for group in range(0, 256, 16 << level)),
+    )
+    for level in range(5)
+]
+
+
+def _mix(values: np.ndarray) -> np.ndarray:
+    """
+    :param values: 64 bit values
+    :return: The values scrambled by the splitmix64 finalizer
+    """
+    values = values ^ (values >> np.uint64(30))
+    values = values * np.uint64(0xBF58476D1CE4E5B9)
+    values = values ^ (values >> np.uint64(27))
+    values = values * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+
+def _mix_int(value: int) -> int:
+    """
+    :param value: A 64 bit value
+    :return: The value scrambled by the splitmix64 finalizer, see _mix
+    """
+    value ^= value >> 30
+    value = (value * 0xBF58476D1CE4E5B9) & _MASK_64
+    value ^= value >> 27
+    value = (value * 0x94D049BB133111EB) & _MASK_64
+    return value ^ (value >> 31)
 
 
 class GridWrapper:
@@ -30,17 +73,73 @@ class GridWrapper:
       - grid
       - start
       - target
+
+    Obstacles are stored in `blocked`, a (y, x) bool array. the rows of Cell
+    objects in `grid` are only built when asked for, so large grids should be
+    created with from_blocked.
+    The grid is compiled into a flat cell index space (cell = y * grid_x_size + x)
+    so simulating a step is a single table lookup:
+      - next_cell[cell, direction]: the cell a step from a cell leads to
+      - target_distance[cell]: the distance of a cell from the target
     """
 
-    def __init__(self, grid: Grid, start: Point, target: Point):
+    MAX_TABLE_CELLS = 100 * 100  # larger grids are not drawn, see drawable
+
+    def __init__(
+        self, grid: Grid, start: Point, target: Point, cache: BoundedCache = None
+    ):
         """
         :param grid: The grid to use
         :param start: The starting point on the grid
         :param target: The target point on the grid
+        :param cache: cache for the outcome of simulated chromosome chunks. defaults
+            to an LRU cache of DEFAULT_CACHE_BUDGET bytes
+        """
+        self._init_blocked(
+            np.array([[cell.blocked for cell in row] for row in grid], dtype=bool),
+            start,
+            target,
+            cache,
+        )
+        self._grid = grid
+
+    @classmethod
+    def from_blocked(
+        cls,
+        blocked: np.ndarray,
+        start: Point,
+        target: Point,
+        cache: BoundedCache = None,
+    ) -> "GridWrapper":
         """
-        self.grid = grid
-        self.grid_x_size = len(grid[0])
-        self.grid_y_size = len(grid)
+        Builds a grid straight from an obstacle array, without Cell objects
+        :param blocked: A (y, x) array, true where a cell is blocked
+        :param start: see GridWrapper.__init__
+        :param target: see GridWrapper.__init__
+        :param cache: see GridWrapper.__init__
+        :return: a grid of the obstacles
+        """
+        grid = cls.__new__(cls)
+        grid._init_blocked(blocked, start, target, cache)
+        return grid
+
+    def _init_blocked(
+        self,
+        blocked: np.ndarray,
+        start: Point,
+        target: Point,
+        cache: BoundedCache = None,
+    ) -> None:
+        """
+        Compiles the grid from its obstacles
+        :param blocked: see from_blocked
+        :param start: see GridWrapper.__init__
+        :param target: see GridWrapper.__init__
+        :param cache: see GridWrapper.__init__
+        """
+        self._grid = None
+        self.blocked = np.ascontiguousarray(blocked, dtype=bool)
+        self.grid_y_size, self.grid_x_size = self.blocked.shape
         self.start = start
         self.target = target
 
@@ -49,6 +148,85 @@ class GridWrapper:
         if not self._check_point(target):
             raise ValueError("invalid target point", target)
 
+        self._init_tables(
+            self._compile_next_cell(), self._compile_target_distance(), cache
+        )
+
+    @classmethod
+    def from_tables(
+        cls,
+        start: Point,
+        target: Point,
+        tables: Dict[str, np.ndarray],
+        cache: BoundedCache = None,
+    ) -> "GridWrapper":
+        """
+        Builds a grid from already compiled tables, without compiling them again.
+        the tables may be backed by shared memory
+        :param start: The starting point on the grid
+        :param target: The target point on the grid
+        :param tables: The tables of another grid. see GridWrapper.tables
+        :param cache: see GridWrapper.__init__
+        :return: a grid using the tables. it adopts the walking distance of the other
+            grid, if that was computed
+        """
+        grid = cls.__new__(cls)
+        grid._grid = None
+        grid.blocked = tables["blocked"]
+        grid.grid_y_size, grid.grid_x_size = grid.blocked.shape
+        grid.start = start
+        grid.target = target
+        grid._init_tables(tables["next_cell"], tables["target_distance"], cache)
+        grid._walking_distance = tables.get("walking_distance")
+        return grid
+
+    def _init_tables(
+        self,
+        next_cell: np.ndarray,
+        target_distance: np.ndarray,
+        cache: BoundedCache = None,
+    ) -> None:
+        """
+        :param next_cell: The compiled transition table
+        :param target_distance: The compiled distance table
+        :param cache: see GridWrapper.__init__
+        """
+        self.start_cell = self.point_cell(self.start)
+        self.target_cell = self.point_cell(self.target)
+        self.next_cell = next_cell
+        self.target_distance = target_distance
+        # flat views for scalar lookups, indexing them returns plain ints
+        self._next_cell = memoryview(self.next_cell.reshape(-1))
+        self._target_distance = memoryview(self.target_distance)
+        self.cache = cache if cache is not None else create_cache(DEFAULT_CACHE_BUDGET)
+        self._walking_distance = None
+
+    @property
+    def grid(self) -> Grid:
+        """
+        :return: The grid as rows of cells. built on first access, avoid on large
+            grids
+        """
+        if self._grid is None:
+            self._grid = [[Cell(bool(b)) for b in row] for row in self.blocked]
+
+        return self._grid
+
+    def tables(self) -> Dict[str, np.ndarray]:
+        """
+        :return: The arrays the grid is compiled into, by name. the walking distance
+            is included once computed
+        """
+        tables = {
+            "blocked": self.blocked,
+            "next_cell": self.next_cell,
+            "target_distance": self.target_distance,
+        }
+        if self._walking_distance is not None:
+            tables["walking_distance"] = self._walking_distance
+
+        return tables
+
     def _check_point(self, point) -> bool:
         """
         Checks that a point is accessible on the grid
@@ -61,39 +239,218 @@ class GridWrapper:
             or point.x >= self.grid_x_size
         ):
             return False
-        if self.grid[point.y][point.x].blocked:
+        if self.blocked[point.y, point.x]:
             return False
         return True
 
-    def _next_point(self, current: Point, step: Direction):
+    def _compile_next_cell(self) -> np.ndarray:
         """
-        Finds the step result
-        :param current: Current point on the grid
-        :param step: The direction we are moving in
-        :return: The next point on the grid
+        :return: a (cells, directions) table of the cell each step leads to. steps
+            into a wall or out of the grid stay in place
         """
-        next = Point(current.x + step.x, current.y + step.y)
-        if not self._check_point(next):
-            return current
+        y_size, x_size = self.grid_y_size, self.grid_x_size
+        cells = np.arange(y_size * x_size, dtype=np.int32).reshape(y_size, x_size)
+        free = ~self.blocked
+        next_cell = np.empty((y_size, x_size, DIRECTION_COUNT), dtype=np.int32)
+        moves = np.zeros((y_size, x_size), dtype=np.int32)
+        for i in range(DIRECTION_COUNT):
+            dx, dy = int(DIRECTION_X[i]), int(DIRECTION_Y[i])
+            # the cells whose neighbour in the direction is inside the grid, and
+            # those neighbours
+            sources = (
+                slice(max(-dy, 0), y_size - max(dy, 0)),
+                slice(max(-dx, 0), x_size - max(dx, 0)),
+            )
+            neighbours = (
+                slice(max(dy, 0), y_size - max(-dy, 0)),
+                slice(max(dx, 0), x_size - max(-dx, 0)),
+            )
+            # a step moves by the cell index difference of the neighbour, if free
+            moves[...] = 0
+            np.multiply(free[neighbours], dy * x_size + dx, out=moves[sources])
+            np.add(cells, moves, out=next_cell[..., i])
 
-        return next
+        return next_cell.reshape(-1, DIRECTION_COUNT)
 
-    @lru_cache()
-    def _simulate_movement(self, start: Point, steps: tuple) -> Point:
+    @property
+    def walking_distance(self) -> np.ndarray:
+        """
+        :return: the length of the shortest path from every cell to the target,
+            around obstacles. computed once, on first access. cells the target can
+            not be reached from get the amount of cells in the grid, which is longer
+            than any path
+        """
+        if self._walking_distance is None:
+            self._walking_distance = self._compile_walking_distance()
+
+        return self._walking_distance
+
+    def _compile_walking_distance(self) -> np.ndarray:
+        """
+        :return: see walking_distance. a breadth first search from the target,
+            steps are reversible so the search follows next_cell
+        """
+        cells = self.grid_x_size * self.grid_y_size
+        walking_distance = np.full(cells, cells, dtype=np.int32)
+        walking_distance[self.target_cell] = 0
+        frontier = np.array([self.target_cell], dtype=np.int32)
+        dist = 0
+        while len(frontier):
+            dist += 1
+            neighbours = np.unique(self.next_cell[frontier])
+            frontier = neighbours[walking_distance[neighbours] == cells]
+            walking_distance[frontier] = dist
+
+        return walking_distance
+
+    def _compile_target_distance(self) -> np.ndarray:
+        """
+        :return: the distance of every cell from the target
+        """
+        y = np.abs(np.arange(self.grid_y_size, dtype=np.int32) - int(self.target.y))
+        x = np.abs(np.arange(self.grid_x_size, dtype=np.int32) - int(self.target.x))
+        return (y[:, np.newaxis] + x).reshape(-1)
+
+    def point_cell(self, point: Point) -> int:
+        """
+        :param point: A point on the grid
+        :return: The index of the point's cell
+        """
+        return point.y * self.grid_x_size + point.x
+
+    def cell_point(self, cell: int) -> Point:
+        """
+        :param cell: A cell index
+        :return: The point of the cell on the grid
+        """
+        y, x = divmod(cell, self.grid_x_size)
+        return Point(x, y)
+
+    def _simulate_movement(self, start: int, steps: Chromosome) -> Tuple[int, int]:
         """
         Simulates the movement of a series of steps on the grid
-        :param start: The start point
+        :param start: The start cell
         :param steps: The series of steps
-        :return: the point we stop in
+        :return: the cell we stop in, and the amount of steps taken until we stopped
         """
+        next_cell = self._next_cell
+        target = self.target_cell
         current = start
+        for i, step in enumerate(steps, 1):
+            current = next_cell[current * DIRECTION_COUNT + step]
+
+            if current == target: # short-circut
+                return current, i
+
+        return current, len(steps)
+
+    def simulate(self, steps: Chromosome) -> Tuple[int, int]:
+        """
+        Simulates the movement of a chromosome on the grid
+        :param steps: The series of steps
+        :return: the cell we stop in, and the amount of steps taken until we stopped
+        """
+        return self._simulate_chunks(steps, self.start_cell)
+
+    def compact(
+        self, steps: Chromosome, length: int = None, drop_bumps: bool = False
+    ) -> Chromosome:
+        """
+        Removes genes which do not affect where a chromosome stops
+        :param steps: The chromosome
+        :param length: The amount of genes used until stopping, see simulate. genes
+            after it are dropped
+        :param drop_bumps: If true, steps into walls or out of the grid, which do not
+            move the robot, are dropped too
+        :return: the compacted chromosome, following the same path
+        """
+        if length is None:
+            _, length = self.simulate(steps)
+
+        steps = steps[:length]
+        if not drop_bumps:
+            return steps
+
+        kept = bytearray()
+        current = self.start_cell
         for step in steps:
-            current = self._next_point(current, step)
+            next = self._next_cell[current * DIRECTION_COUNT + step]
+            if next != current:
+                kept.append(step)
+                current = next
 
-            if current == self.target: # short-circut
-                break
+        return bytes(kept)
+
+    @staticmethod
+    def _chunk_keys(
+        chunks: np.ndarray, lengths: np.ndarray, starts: np.ndarray
+    ) -> np.ndarray:
+        """
+        Hashes chunks of steps along with the cell they start from, the keys of their
+        outcomes in the cache
+        :param chunks: A padded array of direction indices, one row per chunk. padding
+            cells must be zero
+        :param lengths: The length of each chunk
+        :param starts: The cell each chunk starts from
+        :return: A 64 bit hash of every chunk
+        """
+        genes = chunks.astype(np.uint64) << _CHUNK_SHIFTS[: chunks.shape[1]]
+        keys = np.bitwise_or.reduce(genes, axis=1) ^ (
+            lengths.astype(np.uint64) << np.uint64(58)
+        )
+        return _mix(keys ^ _mix(starts.astype(np.uint64)))
+
+    @staticmethod
+    def _chunk_key(chunk: Chromosome, start: int) -> int:
+        """
+        The key of a single chunk, equal to its key from _chunk_keys
+        :param chunk: The steps of the chunk
+        :param start: The cell the chunk starts from
+        :return: A 64 bit hash of the chunk
+        """
+        genes = int.from_bytes(chunk, "little")
+        for shift, mask in _PACK_STEPS:
+            genes = (genes | (genes >> shift)) & mask
+
+        return _mix_int(genes ^ (len(chunk) << 58) ^ _mix_int(start))
+
+    def simulate_cell(self, steps: Chromosome, start: int = None) -> int:
+        """
+        Simulates the movement of a chromosome on the grid
+        :param steps: The series of steps
+        :param start: The cell to start from. defaults to the start of the grid
+        :return: the cell we stop in
+        """
+        return self._simulate_chunks(
+            steps, self.start_cell if start is None else start
+        )[0]
 
-        return current
+    def _simulate_chunks(self, steps: Chromosome, start: int) -> Tuple[int, int]:
+        """
+        Simulates the movement of a chromosome chunk by chunk, caching the outcome
+        of every chunk (see simulate_population)
+        :param steps: The series of steps
+        :param start: The cell to start from
+        :return: see simulate
+        """
+        cache = self.cache
+        if cache.capacity == 0:
+            return self._simulate_movement(start, steps)
+
+        current = start
+        for i in range(0, len(steps), SIMULATION_CHUNK_SIZE):
+            chunk = steps[i : i + SIMULATION_CHUNK_SIZE]
+            key = self._chunk_key(chunk, current)
+            outcome = cache.get(key)
+            if outcome is None:
+                outcome = self._simulate_movement(current, chunk)
+                cache.put(key, outcome)
+
+            current, used = outcome
+            if current == self.target_cell: # short-circut
+                return current, i + used
+
+        return current, len(steps)
 
     def simulate_movement(self, steps: Chromosome) -> Point:
         """
@@ -101,13 +458,98 @@ class GridWrapper:
         :param steps: The series of steps
         :return: the point we stop in
         """
-        current = self.start
-        for c in chunk(steps, 25):
-            current = self._simulate_movement(current, tuple(c))
-            if current == self.target: # short-circut
+        return self.cell_point(self.simulate_cell(steps))
+
+    def simulate_population(
+        self, steps: np.ndarray, lengths: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Simulates the movement of a whole population in lockstep, a chunk of
+        SIMULATION_CHUNK_SIZE gene positions at a time. the outcome of every chunk
+        is cached by its genes and start cell, a chunk position is only simulated
+        for the chromosomes which missed the cache
+        :param steps: A padded array of direction indices, one row per chromosome.
+            see chromosome.to_array
+        :param lengths: The length of each chromosome
+        :return: the cell each chromosome stops in, and the amount of steps it took
+            until it stopped
+        """
+        cells = np.full(len(lengths), self.start_cell, dtype=np.int32)
+        if self.cache.capacity == 0:
+            return self._simulate_lockstep(steps, lengths, cells)
+
+        cache = self.cache
+        used = lengths.copy()
+        moving = np.ones(len(lengths), dtype=bool)
+        for position in range(0, steps.shape[1], SIMULATION_CHUNK_SIZE):
+            moving &= position < lengths
+            indices = np.flatnonzero(moving)
+            if not len(indices):
+                break
+
+            chunks = steps[indices, position : position + SIMULATION_CHUNK_SIZE]
+            chunk_lengths = np.minimum(lengths[indices] - position, chunks.shape[1])
+            keys = self._chunk_keys(chunks, chunk_lengths, cells[indices]).tolist()
+            outcomes = [cache.get(key) for key in keys]
+            missed = [i for i, outcome in enumerate(outcomes) if outcome is None]
+            if len(missed) > SCALAR_SIMULATION_ROWS:
+                ends, chunk_used = self._simulate_lockstep(
+                    chunks[missed], chunk_lengths[missed], cells[indices[missed]]
+                )
+                for i, outcome in zip(missed, zip(ends.tolist(), chunk_used.tolist())):
+                    outcomes[i] = outcome
+                    cache.put(keys[i], outcome)
+            elif missed:
+                starts = cells[indices].tolist()
+                for i in missed:
+                    chunk = chunks[i, : chunk_lengths[i]].tobytes()
+                    outcomes[i] = self._simulate_movement(starts[i], chunk)
+                    cache.put(keys[i], outcomes[i])
+
+            ends = np.array([outcome[0] for outcome in outcomes], dtype=np.int32)
+            cells[indices] = ends
+            arrived = ends == self.target_cell
+            if arrived.any():
+                arrived_used = [outcomes[i][1] for i in np.flatnonzero(arrived)]
+                used[indices[arrived]] = position + np.array(arrived_used)
+                moving[indices[arrived]] = False
+
+        return cells, used
+
+    def _simulate_lockstep(
+        self, steps: np.ndarray, lengths: np.ndarray, cells: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Simulates the movement of a group of chromosomes in lockstep, one gene
+        position at a time
+        :param steps: see simulate_population
+        :param lengths: see simulate_population
+        :param cells: The cell each chromosome starts from
+        :return: see simulate_population
+        """
+        used = lengths.copy()
+        moving = np.ones(len(lengths), dtype=bool)
+        for i in range(steps.shape[1]):
+            moving &= i < lengths
+            if not moving.any():
                 break
 
-        return current
+            cells = np.where(moving, self.next_cell[cells, steps[:, i]], cells)
+            arrived = moving & (cells == self.target_cell)  # short-circut
+            used[arrived] = i + 1
+            moving &= ~arrived
+
+        return cells, used
+
+    def calculate_distances(self, chroms: Sequence[Chromosome]) -> np.ndarray:
+        """
+        Calculates the distance of the robot from the target for a group of
+        chromosomes, using a single batch simulation
+        :param chroms: The chromosomes
+        :return: the distance to the target of each chromosome
+        """
+        cells, _ = self.simulate_population(*to_array(chroms))
+        return self.target_distance[cells]
 
     def calculate_distance(self, steps: Chromosome) -> int:
         """
@@ -116,25 +558,44 @@ class GridWrapper:
         :param steps: The chromosome
         :return: the distance to the target
         """
-        current = self.simulate_movement(steps)
-        return distance(current, self.target)
+        return self._target_distance[self.simulate_cell(steps)]
+
+    def cell_distance(self, cell: int) -> int:
+        """
+        :param cell: A cell index
+        :return: the distance of the cell from the target
+        """
+        return self._target_distance[cell]
 
-    def to_table(self, path: Chromosome = None) -> SingleTable:
+    @property
+    def drawable(self) -> bool:
+        """
+        :return: True if the grid is small enough to draw with to_table
+        """
+        return self.grid_x_size * self.grid_y_size <= self.MAX_TABLE_CELLS
+
+    def to_table(self, path: Chromosome = None, steps: int = None) -> SingleTable:
         """
         Converts a grid to a textual table
         :param path: optional path to draw on the grid
+        :param steps: amount of steps of the path to draw, if already known from
+            simulating it. defaults to drawing until the target is reached
         :return: a SingleTable object
         """
         table_data = [
-            ["*" if cell.blocked else "" for cell in row] for row in self.grid
+            ["*" if blocked else "" for blocked in row] for row in self.blocked
         ]
 
         if path:
-            current = self.start
-            for step in path:
-                table_data[current.y][current.x] = step.icon
-                current = self._next_point(current, step)
-                if current == self.target: # short-circut
+            if steps is not None:
+                path = path[:steps]
+
+            current = self.start_cell
+            for step, direction in zip(path, to_directions(path)):
+                y, x = divmod(current, self.grid_x_size)
+                table_data[y][x] = direction.icon
+                current = self._next_cell[current * DIRECTION_COUNT + step]
+                if current == self.target_cell: # short-circut
                     break
 
         if self.start:
@@ -147,5 +608,17 @@ class GridWrapper:
         table.inner_row_border = True
         return table
 
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # memoryviews can not be pickled, they are rebuilt on load
+        del state["_next_cell"]
+        del state["_target_distance"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._next_cell = memoryview(self.next_cell.reshape(-1))
+        self._target_distance = memoryview(self.target_distance)
+
     def __str__(self) -> str:
         return self.to_table().table + "\n"
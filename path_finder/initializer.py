@@ -0,0 +1,264 @@
+"""
+Seeding the first population
+"""
+import abc
+import enum
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from path_finder.chromosome import Chromosome, random_chromosome, from_flat
+from path_finder.grid import GridWrapper, DIRECTION_COUNT
+from path_finder.operators import (
+    Mutation,
+    SwitchMutation,
+    AddMutation,
+    RemoveMutation,
+    RemovePairMutation,
+)
+from path_finder.point import distance
+
+
+class InitializationMethod(enum.Enum):
+    """
+    Available initialization methods
+    """
+
+    RANDOM = "random"
+    WALK = "walk"  # random walks biased toward the target
+    DESCENT = "descent"  # randomized greedy descent on the walking distance
+    HINT = "hint"  # mutated copies of a given path
+
+
+# the weight of every initialization method in the first population
+SeedingMix = Dict[InitializationMethod, float]
+DEFAULT_SEEDING: SeedingMix = {InitializationMethod.RANDOM: 1.0}
+
+
+class Initializer(abc.ABC):
+    """
+    Creates chromosomes for the first population
+    """
+
+    def __init__(self, grid: GridWrapper):
+        """
+        :param grid: The environment the chromosomes move on
+        """
+        self.grid = grid
+        self.min_dist = distance(grid.start, grid.target)
+
+    @abc.abstractmethod
+    def create(self, count: int, rng: np.random.Generator) -> List[Chromosome]:
+        """
+        :param count: Amount of chromosomes to create
+        :param rng: The random generator to draw with
+        :return: The chromosomes
+        """
+        raise NotImplementedError()
+
+
+class RandomInitializer(Initializer):
+    """
+    Uniformly random chromosomes, half as long as the distance to the target and half
+    twice as long. draws from `random`, like the operators of unbatched runs
+    """
+
+    def create(self, count: int, rng: np.random.Generator) -> List[Chromosome]:
+        """
+        See Initializer.create
+        """
+        short_count = count // 2
+        return [random_chromosome(self.min_dist) for _ in range(short_count)] + [
+            random_chromosome(self.min_dist * 2) for _ in range(count - short_count)
+        ]
+
+
+class DescentInitializer(Initializer):
+    """
+    Walks from the start, stepping down a distance field with some probability and in
+    a random direction otherwise. a walk ends at the target or at its length limit
+    """
+
+    def __init__(self, grid: GridWrapper, field: np.ndarray, probability: float):
+        """
+        See Initializer.__init__
+        :param field: The distance from the target of every cell
+        :param probability: The probability of each step to lower the distance, when
+            a step can
+        """
+        super().__init__(grid)
+        self.field = field
+        self.probability = probability
+
+    def lengths(self, count: int, rng: np.random.Generator) -> np.ndarray:
+        """
+        :param count: Amount of walks
+        :param rng: The random generator to draw with
+        :return: The length limit of every walk
+        """
+        return rng.integers(self.min_dist, self.min_dist * 2, size=count, endpoint=True)
+
+    def create(self, count: int, rng: np.random.Generator) -> List[Chromosome]:
+        """
+        See Initializer.create
+        """
+        lengths = self.lengths(count, rng)
+        genes = np.zeros((count, lengths.max(initial=0)), dtype=np.uint8)
+        cells = np.full(count, self.grid.start_cell, dtype=np.int64)
+        walking = np.ones(count, dtype=bool)
+        for step in range(genes.shape[1]):
+            walking &= (cells != self.grid.target_cell) & (step < lengths)
+            lengths = np.where(walking, lengths, np.minimum(lengths, step))
+            if not walking.any():
+                break
+
+            neighbours = self.grid.next_cell[cells]
+            lower = self.field[neighbours] < self.field[cells, np.newaxis]
+            # descending walks choose among the lowering steps, the others among all
+            descend = (rng.random(count) < self.probability) & lower.any(axis=1)
+            allowed = lower | ~descend[:, np.newaxis]
+            keys = np.where(allowed, rng.random((count, DIRECTION_COUNT)), -1)
+            directions = keys.argmax(axis=1)
+            genes[:, step] = directions
+            cells = np.where(walking, neighbours[np.arange(count), directions], cells)
+
+        offsets = np.zeros(count + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        return from_flat(genes[np.arange(genes.shape[1]) < lengths[:, None]], offsets)
+
+
+class WalkInitializer(DescentInitializer):
+    """
+    Random walks biased toward the target, ignoring walls
+    """
+
+    DEFAULT_BIAS = 0.5
+
+    def __init__(self, grid: GridWrapper, bias: float = DEFAULT_BIAS):
+        """
+        See Initializer.__init__
+        :param bias: The probability of each step to get closer to the target
+        """
+        super().__init__(grid, grid.target_distance, bias)
+
+
+class GreedyDescentInitializer(DescentInitializer):
+    """
+    Randomized greedy descent on the walking distance, so walks go around walls.
+    without noise every walk is a shortest path
+    """
+
+    DEFAULT_NOISE = 0.2
+    LENGTH_FACTOR = 2  # limit of the walks, relative to the shortest path
+
+    def __init__(self, grid: GridWrapper, noise: float = DEFAULT_NOISE):
+        """
+        See Initializer.__init__
+        :param noise: The probability of each step to be random
+        """
+        super().__init__(grid, grid.walking_distance, 1 - noise)
+
+    def lengths(self, count: int, rng: np.random.Generator) -> np.ndarray:
+        """
+        See DescentInitializer.lengths
+        """
+        shortest = int(self.field[self.grid.start_cell])
+        if shortest >= len(self.field):  # the target can not be reached
+            shortest = self.min_dist
+        return np.full(count, shortest * self.LENGTH_FACTOR, dtype=np.int64)
+
+
+class HintInitializer(Initializer):
+    """
+    Mutated copies of a given path. the first copy is left as is
+    """
+
+    DEFAULT_STRENGTH = 10  # mutation probabilities, relative to the Finder's
+
+    def __init__(
+        self,
+        grid: GridWrapper,
+        hint: Chromosome,
+        mutations: Sequence[Mutation] = None,
+        strength: float = DEFAULT_STRENGTH,
+    ):
+        """
+        See Initializer.__init__
+        :param hint: The path to copy
+        :param mutations: The mutations to apply to the copies. defaults to the
+            Finder's mutations, `strength` times as likely
+        :param strength: see mutations
+        """
+        super().__init__(grid)
+        self.hint = hint
+        if mutations is None:
+            mutations = [
+                mutation_class(
+                    self.min_dist, mutation_class.DEFAULT_PROBABILITY * strength
+                )
+                for mutation_class in (
+                    SwitchMutation,
+                    AddMutation,
+                    RemoveMutation,
+                    RemovePairMutation,
+                )
+            ]
+        self.mutations = mutations
+
+    def create(self, count: int, rng: np.random.Generator) -> List[Chromosome]:
+        """
+        See Initializer.create
+        """
+        if count <= 0:
+            return []
+
+        genes = np.tile(np.frombuffer(self.hint, dtype=np.uint8), count - 1)
+        offsets = np.arange(count, dtype=np.int64) * len(self.hint)
+        for mutation in self.mutations:
+            genes, offsets = mutation.mutate_batch(genes, offsets, rng)
+
+        return [self.hint] + from_flat(genes, offsets)
+
+
+INITIALIZERS = {
+    InitializationMethod.RANDOM: RandomInitializer,
+    InitializationMethod.WALK: WalkInitializer,
+    InitializationMethod.DESCENT: GreedyDescentInitializer,
+    InitializationMethod.HINT: HintInitializer,
+}
+
+
+def create_initializer(
+    method: InitializationMethod, grid: GridWrapper, hint: Chromosome = None
+) -> Initializer:
+    """
+    :param method: The initialization method
+    :param grid: see Initializer.__init__
+    :param hint: see HintInitializer.__init__, needed by the HINT method only
+    :return: An initializer of the method
+    """
+    if method is InitializationMethod.HINT:
+        if hint is None:
+            raise ValueError("hint initialization needs a hint path")
+        return HintInitializer(grid, hint)
+
+    return INITIALIZERS[method](grid)
+
+
+def seed_counts(weights: Sequence[float], count: int) -> List[int]:
+    """
+    Splits chromosomes between initializers by their weight
+    :param weights: The weight of every initializer
+    :param count: Amount of chromosomes to split
+    :return: Amount of chromosomes of every initializer, summing to `count`
+    """
+    shares = np.asarray(weights, dtype=np.float64)
+    if len(shares) == 0 or (shares < 0).any() or shares.sum() <= 0:
+        raise ValueError("seeding weights must be non-negative, and not all zero")
+
+    shares = shares / shares.sum() * count
+    counts = np.floor(shares).astype(np.int64)
+    # the largest remainders get the chromosomes left over
+    remainders = np.argsort(counts - shares, kind="stable")
+    counts[remainders[: count - counts.sum()]] += 1
+    return counts.tolist()
@@ -0,0 +1,201 @@
+"""
+The island model: several finders evolving apart and exchanging their best
+chromosomes every few generations
+"""
+import enum
+import random
+import multiprocessing
+from dataclasses import dataclass
+from typing import Type, List, Sequence, Optional
+
+from path_finder.chromosome import Chromosome
+from path_finder.finder import Finder
+from path_finder.fitness import Fitness
+from path_finder.grid import GridWrapper
+from path_finder.population import RankedItem
+
+
+class Topology(enum.Enum):
+    """
+    Available migration topologies
+    """
+
+    RING = "ring"  # each island sends its best to the next island
+    ALL_TO_ALL = "all"  # each island sends its best to every other island
+
+
+@dataclass
+class IslandState:
+    """
+    A state of a single island after a migration epoch
+    """
+
+    island: int
+    generation: int
+    top_distance: int
+    top_length: int
+    top_fitness: float
+    median_fitness: float
+
+
+def _run_island(
+    connection,
+    island: int,
+    grid: GridWrapper,
+    population_size: int,
+    fitness_class: Type[Fitness],
+    migration_size: int,
+    seed: int,
+) -> None:
+    """
+    The loop of an island process: receives immigrants and an amount of generations
+    to run, runs them and answers with its emigrants and state.
+    stops when receiving None
+    :param connection: The pipe to the IslandFinder
+    :param island: The index of the island
+    :param grid: see Finder.__init__
+    :param population_size: see Finder.__init__
+    :param fitness_class: see Finder.__init__
+    :param migration_size: Amount of top chromosomes to send on migration
+    :param seed: Seed for the island's random generator
+    """
+    random.seed(seed)
+    with Finder(grid, population_size, fitness_class) as finder:
+        while True:
+            command = connection.recv()
+            if command is None:
+                break
+
+            generations, immigrants = command
+            finder.migrate(immigrants)
+            for _ in range(generations):
+                finder.run_generation()
+
+            population = finder.population
+            connection.send(
+                (
+                    population.top(migration_size),
+                    IslandState(
+                        island,
+                        finder.generation,
+                        population.top_evaluation.distance,
+                        len(population.top_item),
+                        population.top_fitness,
+                        population.median_fitness,
+                    ),
+                )
+            )
+
+
+class IslandFinder:
+    """
+    Runs several Finder populations in separate processes, migrating the top
+    chromosomes of each island to its neighbours every few generations
+    """
+
+    def __init__(
+        self,
+        grid: GridWrapper,
+        islands: int,
+        population_size: int,
+        fitness_class: Type[Fitness],
+        migration_interval: int = 20,
+        migration_size: int = 2,
+        topology: Topology = Topology.RING,
+    ):
+        """
+        :param grid: The environment to run the algorithm on
+        :param islands: Amount of islands (processes) to run
+        :param population_size: The population size of each island
+        :param fitness_class: The fitness function to use
+        :param migration_interval: Amount of generations between migrations
+        :param migration_size: Amount of top chromosomes each island sends
+        :param topology: Which islands receive each island's chromosomes
+        """
+        self.grid = grid
+        self.migration_interval = migration_interval
+        self.topology = topology
+        self.generation = 0
+        self.best: Optional[RankedItem] = None
+        self.states: List[IslandState] = []
+        self._immigrants: List[List[Chromosome]] = [[] for _ in range(islands)]
+        self._connections = []
+        self._processes = []
+        for island in range(islands):
+            connection, child_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=_run_island,
+                args=(
+                    child_connection,
+                    island,
+                    grid,
+                    population_size,
+                    fitness_class,
+                    migration_size,
+                    random.getrandbits(64),
+                ),
+                daemon=True,
+            )
+            process.start()
+            self._connections.append(connection)
+            self._processes.append(process)
+
+    def run_epoch(self) -> None:
+        """
+        Runs migration_interval generations on every island, then migrates
+        """
+        for connection, immigrants in zip(self._connections, self._immigrants):
+            connection.send((self.migration_interval, immigrants))
+
+        results = [connection.recv() for connection in self._connections]
+        self.generation += self.migration_interval
+        self.states = [state for _, state in results]
+        for emigrants, _ in results:
+            if self.best is None or emigrants[0].fitness > self.best.fitness:
+                self.best = emigrants[0]
+
+        self._immigrants = self._route([emigrants for emigrants, _ in results])
+
+    def _route(
+        self, emigrants: Sequence[Sequence[RankedItem]]
+    ) -> List[List[Chromosome]]:
+        """
+        :param emigrants: The chromosomes each island sent
+        :return: The chromosomes each island receives, according to the topology
+        """
+        count = len(emigrants)
+        if self.topology == Topology.RING:
+            sources = [[(island - 1) % count] for island in range(count)]
+        else:
+            sources = [list(range(count)) for _ in range(count)]
+
+        # an island never receives its own chromosomes, they would only replace its
+        # worst members with duplicates. a single island receives none
+        return [
+            [
+                item.chromosome
+                for source in island_sources
+                if source != island
+                for item in emigrants[source]
+            ]
+            for island, island_sources in enumerate(sources)
+        ]
+
+    def close(self) -> None:
+        """
+        Stops the island processes
+        """
+        for connection in self._connections:
+            connection.send(None)
+
+        for process in self._processes:
+            process.join()
+
+        self._connections = []
+        self._processes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
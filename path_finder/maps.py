@@ -0,0 +1,223 @@
+"""
+Loading environments from obstacle map files.
+
+Supported formats, by file extension:
+  - ASCII (.txt, .map): one line per row, all of the same width, BLOCKED_CHARACTERS
+    are obstacles. an optional MovingAI header ("type", "height", "width" and "map"
+    lines) is skipped
+  - PGM (.pgm): a binary (P5) grayscale image, dark pixels are obstacles
+  - raw bitmap (.raw, .bin): one bit per cell, rows padded to whole bytes, set bits
+    are obstacles. the sidecar gives its width and height
+
+Map files are memory-mapped and converted to an obstacle array in one pass.
+The first row of a file is the top of the grid, like to_table draws it.
+
+The start and target are read from a json sidecar next to the map, with the same
+name and a .json extension:
+    {"start": [x, y], "target": [x, y]}
+where y counts rows from the bottom of the map, as Point does.
+"""
+import json
+import os.path
+from typing import Dict, Tuple
+
+import numpy as np
+
+from path_finder.cache import BoundedCache
+from path_finder.grid import GridWrapper
+from path_finder.point import Point
+
+BLOCKED_CHARACTERS = b"#*@OTW"
+MOVING_AI_HEADER_LINES = 4
+
+ASCII_EXTENSIONS = {".txt", ".map"}
+PGM_EXTENSIONS = {".pgm"}
+RAW_EXTENSIONS = {".raw", ".bin"}
+
+
+def sidecar_path(path: str) -> str:
+    """
+    :param path: The path of a map file
+    :return: The path of the map's sidecar
+    """
+    return os.path.splitext(path)[0] + ".json"
+
+
+def read_sidecar(path: str) -> Dict:
+    """
+    :param path: The path of a sidecar file
+    :return: The sidecar's settings, with start and target as points
+    """
+    with open(path, "rt") as f:
+        sidecar = json.load(f)
+
+    for key in ("start", "target"):
+        if key not in sidecar:
+            raise ValueError(f"sidecar is missing '{key}'", path)
+        sidecar[key] = Point(*sidecar[key])
+
+    return sidecar
+
+
+def _read_ascii(path: str) -> np.ndarray:
+    """
+    :param path: The path of an ASCII map
+    :return: The obstacles of the map, top row first
+    """
+    data = np.memmap(path, dtype=np.uint8, mode="r")
+    start = 0
+    header_lines = 0
+    if bytes(data[:4]) == b"type":
+        newlines = np.flatnonzero(data[:1024] == ord("\n"))
+        start = int(newlines[MOVING_AI_HEADER_LINES - 1]) + 1
+        header_lines = MOVING_AI_HEADER_LINES
+
+    body = data[start:]
+    newlines = np.flatnonzero(body == ord("\n"))
+    starts = np.concatenate([[0], newlines + 1])
+    ends = np.concatenate([newlines, [len(body)]])
+    if starts[-1] == len(body):  # the last row ends with a newline
+        starts, ends = starts[:-1], ends[:-1]
+
+    carriage_returns = np.zeros(len(ends), dtype=bool)
+    carriage_returns[ends > starts] = body[ends[ends > starts] - 1] == ord("\r")
+    ends = ends - carriage_returns
+    widths = ends - starts
+    if len(widths) == 0:
+        raise ValueError("empty map", path)
+
+    ragged = np.flatnonzero(widths != widths[0])
+    if len(ragged):
+        line = int(ragged[0])
+        raise ValueError(
+            f"line {header_lines + line + 1} is {widths[line]} cells wide, "
+            f"expected {widths[0]}",
+            path,
+        )
+
+    width = int(widths[0])
+    strides = np.diff(starts)
+    if len(strides) == 0 or (strides == strides[0]).all():
+        stride = int(strides[0]) if len(strides) else width
+        rows = np.lib.stride_tricks.as_strided(
+            body[starts[0] :],
+            shape=(len(starts), width),
+            strides=(stride, 1),
+            writeable=False,
+        )
+    else:  # mixed line endings
+        rows = body[starts[:, np.newaxis] + np.arange(width)]
+
+    blocked_bytes = np.zeros(256, dtype=bool)
+    blocked_bytes[list(BLOCKED_CHARACTERS)] = True
+    return blocked_bytes[rows]
+
+
+def _pgm_header(data: np.ndarray) -> Tuple[int, int, int, int]:
+    """
+    :param data: The bytes of a PGM file
+    :return: The width, height and maximal value of the image, and the offset of
+        its pixels
+    """
+    header = data[:1024].tobytes()
+    tokens = []
+    position = 0
+    while len(tokens) < 4:
+        while header[position : position + 1].isspace():
+            position += 1
+        if header[position : position + 1] == b"#":
+            position = header.index(b"\n", position) + 1
+            continue
+
+        end = position
+        while end < len(header) and not header[end : end + 1].isspace():
+            end += 1
+        tokens.append(header[position:end])
+        position = end
+
+    if tokens[0] != b"P5":
+        raise ValueError("only binary (P5) PGM maps are supported", tokens[0])
+
+    width, height, max_value = (int(token) for token in tokens[1:])
+    # a single whitespace separates the header from the pixels
+    return width, height, max_value, position + 1
+
+
+def _read_pgm(path: str, threshold: int = None) -> np.ndarray:
+    """
+    :param path: The path of a PGM map
+    :param threshold: Pixels darker than it are obstacles. defaults to half the
+        maximal value
+    :return: The obstacles of the map, top row first
+    """
+    width, height, max_value, offset = _pgm_header(
+        np.memmap(path, dtype=np.uint8, mode="r")
+    )
+    pixels = np.memmap(
+        path,
+        dtype=np.uint8 if max_value < 256 else ">u2",
+        mode="r",
+        offset=offset,
+        shape=(height, width),
+    )
+    if threshold is None:
+        threshold = (max_value + 1) // 2
+
+    return pixels < threshold
+
+
+def _read_raw(path: str, width: int, height: int) -> np.ndarray:
+    """
+    :param path: The path of a raw bitmap
+    :param width: The width of the map in cells
+    :param height: The height of the map in cells
+    :return: The obstacles of the map, top row first
+    """
+    row_size = (width + 7) // 8
+    bits = np.memmap(path, dtype=np.uint8, mode="r", shape=(height, row_size))
+    return np.unpackbits(bits, axis=1, count=width).view(bool)
+
+
+def read_obstacles(path: str, sidecar: Dict = None) -> np.ndarray:
+    """
+    :param path: The path of a map file
+    :param sidecar: The map's sidecar settings, needed for raw bitmaps. a PGM
+        map may set a "threshold"
+    :return: The obstacles of the map, as GridWrapper.blocked (bottom row first)
+    """
+    sidecar = sidecar or {}
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ASCII_EXTENSIONS:
+        blocked = _read_ascii(path)
+    elif extension in PGM_EXTENSIONS:
+        blocked = _read_pgm(path, sidecar.get("threshold"))
+    elif extension in RAW_EXTENSIONS:
+        if "width" not in sidecar or "height" not in sidecar:
+            raise ValueError("raw maps need a width and height in the sidecar", path)
+        blocked = _read_raw(path, sidecar["width"], sidecar["height"])
+    else:
+        raise ValueError("unknown map format", path)
+
+    return blocked[::-1]
+
+
+def load_map(path: str, cache: BoundedCache = None) -> GridWrapper:
+    """
+    :param path: The path of a map file, with a sidecar next to it
+    :param cache: see GridWrapper.__init__
+    :return: The environment the map describes
+    """
+    sidecar = read_sidecar(sidecar_path(path))
+    return GridWrapper.from_blocked(
+        read_obstacles(path, sidecar), sidecar["start"], sidecar["target"], cache
+    )
+
+
+def map_env(path: str, size=None) -> GridWrapper:
+    """
+    An environment loaded from a map file, usable as an environment creator
+    :param path: see load_map
+    :param size: ignored, maps have their own size
+    :return: see load_map
+    """
+    return load_map(path)
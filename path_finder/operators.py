@@ -2,11 +2,20 @@
 Different genetic operjators the algorithm utilizes
 """
 import abc
+import math
 import random
-from typing import Sequence, Tuple
+from typing import Sequence, Tuple, List, Iterator
 
-from path_finder.chromosome import Chromosome
-from path_finder.direction import random_direction
+import numpy as np
+
+from path_finder.chromosome import (
+    Chromosome,
+    GENES,
+    random_gene,
+    to_flat,
+    from_flat,
+)
+from path_finder.profiling import PhaseTimer, DISABLED_TIMER
 
 
 class Operator(abc.ABC):
@@ -36,6 +45,36 @@ class ProbabilityOperator(Operator):
         """
         return random.random() < self.probability
 
+    def test_positions(self, count: int) -> Iterator[int]:
+        """
+        Makes `count` tests, drawing the gaps between true tests from a geometric
+        distribution, so the cost is in the amount of true tests rather than `count`
+        :param count: Amount of tests to make
+        :return: The positions of the true tests, ascending
+        """
+        if self.probability <= 0:
+            return
+        if self.probability >= 1:
+            yield from range(count)
+            return
+
+        log_failure = math.log1p(-self.probability)
+        position = -1
+        while True:
+            # 1 - random() is in (0, 1], so the log is finite
+            position += 1 + int(math.log(1 - random.random()) / log_failure)
+            if position >= count:
+                return
+            yield position
+
+    def test_probabilities(self, count: int, rng: np.random.Generator) -> np.ndarray:
+        """
+        :param count: Amount of tests to make
+        :param rng: The random generator to draw with
+        :return: A boolean array of `count` tests, see test_probability
+        """
+        return rng.random(count) < self.probability
+
 
 class Cross(ProbabilityOperator):
     """
@@ -55,6 +94,22 @@ class Cross(ProbabilityOperator):
         """
         raise NotImplementedError()
 
+    @abc.abstractmethod
+    def cut_points(
+        self, lengths1: np.ndarray, lengths2: np.ndarray, rng: np.random.Generator
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Crosses many couples at once. the children of a couple are
+        parent1[:point1] + parent2[point2:] and parent2[:point2] + parent1[point1:],
+        so couples which are not crossed get the points (len(parent1), len(parent2))
+        :param lengths1: The lengths of the first chromosome of each couple
+        :param lengths2: The lengths of the second chromosome of each couple
+        :param rng: The random generator to draw with
+        :return: The cut point in the first and in the second chromosome of each
+            couple
+        """
+        raise NotImplementedError()
+
 
 class PathFinderCross(Cross):
     """
@@ -94,6 +149,18 @@ class PathFinderCross(Cross):
             parent2[:second_point] + parent1[first_point:],
         )
 
+    def cut_points(
+        self, lengths1: np.ndarray, lengths2: np.ndarray, rng: np.random.Generator
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        see Cross.cut_points
+        """
+        crossed = self.test_probabilities(len(lengths1), rng)
+        # we can take the entire chromosome
+        first_points = np.where(crossed, rng.integers(lengths1 + 1), lengths1)
+        second_points = np.where(crossed, rng.integers(lengths2 + 1), lengths2)
+        return first_points, second_points
+
 
 class Choose(Operator):
     """
@@ -109,6 +176,16 @@ class Choose(Operator):
         """
         raise NotImplementedError()
 
+    @abc.abstractmethod
+    def choose_first(self, count: int, rng: np.random.Generator) -> np.ndarray:
+        """
+        Chooses for many couples at once
+        :param count: Amount of couples to choose for
+        :param rng: The random generator to draw with
+        :return: A boolean array, True where the first chromosome is selected
+        """
+        raise NotImplementedError()
+
 
 class PathFinderChoose(Choose):
     """
@@ -121,6 +198,12 @@ class PathFinderChoose(Choose):
         """
         return random.choice([parent1, parent2])
 
+    def choose_first(self, count: int, rng: np.random.Generator) -> np.ndarray:
+        """
+        See Choose.choose_first
+        """
+        return rng.random(count) < 0.5
+
 
 class Mutation(ProbabilityOperator):
     """
@@ -143,6 +226,19 @@ class Mutation(ProbabilityOperator):
         """
         raise NotImplementedError()
 
+    @abc.abstractmethod
+    def mutate_batch(
+        self, genes: np.ndarray, offsets: np.ndarray, rng: np.random.Generator
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Mutates many chromosomes at once
+        :param genes: The genes of the chromosomes, see chromosome.to_flat
+        :param offsets: Where each chromosome starts in the genes
+        :param rng: The random generator to draw with
+        :return: The genes and offsets of the chromosomes after the mutation
+        """
+        raise NotImplementedError()
+
 
 class SwitchMutation(Mutation):
     """
@@ -161,7 +257,28 @@ class SwitchMutation(Mutation):
         """
         See Mutation.__call__
         """
-        return [random_direction() if self.test_probability else d for d in chrom]
+        positions = list(self.test_positions(len(chrom)))
+        if not positions:
+            return chrom
+
+        new_chrom = bytearray(chrom)
+        for position in positions:
+            new_chrom[position] = random_gene()
+
+        return bytes(new_chrom)
+
+    def mutate_batch(
+        self, genes: np.ndarray, offsets: np.ndarray, rng: np.random.Generator
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        See Mutation.mutate_batch
+        """
+        switched = self.test_probabilities(len(genes), rng)
+        genes = genes.copy()
+        genes[switched] = rng.integers(
+            len(GENES), size=np.count_nonzero(switched), dtype=np.uint8
+        )
+        return genes, offsets
 
 
 class AddMutation(Mutation):
@@ -181,22 +298,46 @@ class AddMutation(Mutation):
         """
         See Mutation.__call__
         """
-        new_chrom = []
-        self._possibly_append_direction(new_chrom)
-
-        for direction in chrom:
-            new_chrom.append(direction)
-            self._possibly_append_direction(new_chrom)
-
-        return new_chrom
-
-    def _possibly_append_direction(self, new_chrom) -> None:
-        """
-        Adds a direction to the chromosome with the mutation probability
-        :param new_chrom: the chromosome to add the direction to
-        """
-        if self.test_probability:
-            new_chrom.append(random_direction())
+        # a gene can be added before each gene and after the last one
+        positions = list(self.test_positions(len(chrom) + 1))
+        if not positions:
+            return chrom
+
+        new_chrom = bytearray()
+        previous = 0
+        for position in positions:
+            new_chrom += chrom[previous:position]
+            new_chrom.append(random_gene())
+            previous = position
+
+        new_chrom += chrom[previous:]
+        return bytes(new_chrom)
+
+    def mutate_batch(
+        self, genes: np.ndarray, offsets: np.ndarray, rng: np.random.Generator
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        See Mutation.mutate_batch
+        """
+        # a chromosome of n genes has n + 1 places to add a gene at. places and
+        # genes are interleaved: place, gene, place, ..., gene, place
+        count = len(offsets) - 1
+        chrom_indices = np.arange(count)
+        place_offsets = offsets + np.arange(count + 1)
+        places = place_offsets[-1]
+        interleaved = np.empty(len(genes) + places, dtype=np.uint8)
+        # gene i of chromosome c is at 2i + c + 1, place j of chromosome c at 2j - c
+        gene_positions = 2 * np.arange(len(genes)) + 1
+        gene_positions += np.repeat(chrom_indices, np.diff(offsets))
+        place_positions = 2 * np.arange(places)
+        place_positions -= np.repeat(chrom_indices, np.diff(place_offsets))
+        interleaved[gene_positions] = genes
+        interleaved[place_positions] = rng.integers(
+            len(GENES), size=places, dtype=np.uint8
+        )
+        kept = np.ones(len(interleaved), dtype=bool)
+        kept[place_positions] = self.test_probabilities(places, rng)
+        return interleaved[kept], _kept_offsets(kept, offsets + place_offsets)
 
 
 class RemoveMutation(Mutation):
@@ -216,11 +357,16 @@ class RemoveMutation(Mutation):
         """
         See Mutation.__call__
         """
-        return [
-            d
-            for d in chrom
-            if not self.test_probability  # keep on most cases, filter only if test_probability = True
-        ]
+        return _without_slices(chrom, self.test_positions(len(chrom)), 1)
+
+    def mutate_batch(
+        self, genes: np.ndarray, offsets: np.ndarray, rng: np.random.Generator
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        See Mutation.mutate_batch
+        """
+        kept = ~self.test_probabilities(len(genes), rng)
+        return genes[kept], _kept_offsets(kept, offsets)
 
 
 class RemovePairMutation(Mutation):
@@ -240,15 +386,76 @@ class RemovePairMutation(Mutation):
         """
         See Mutation.__call__
         """
-        it = iter(chrom)
-        return sum(
-            (
-                [d1, d2] if d2 else [d1]
-                for d1, d2 in zip(it, it)
-                if not self.test_probability  # keep on most cases, filter only if test_probability = True
-            ),
-            [],
-        )
+        # a trailing gene without a pair is dropped
+        pairs = len(chrom) // 2
+        return _without_slices(chrom[: pairs * 2], self.test_positions(pairs), 2)
+
+    def mutate_batch(
+        self, genes: np.ndarray, offsets: np.ndarray, rng: np.random.Generator
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        See Mutation.mutate_batch
+        """
+        lengths = np.diff(offsets)
+        pair_counts = lengths // 2
+        pair_offsets = np.zeros(len(pair_counts) + 1, dtype=np.int64)
+        np.cumsum(pair_counts, out=pair_offsets[1:])
+        removed = self.test_probabilities(pair_offsets[-1], rng)
+        positions = np.arange(len(genes)) - np.repeat(offsets[:-1], lengths)
+        # a trailing gene without a pair is dropped, as in __call__
+        kept = positions < np.repeat(2 * pair_counts, lengths)
+        pair_indices = np.repeat(pair_offsets[:-1], lengths) + positions // 2
+        kept[kept] = ~removed[pair_indices[kept]]
+        return genes[kept], _kept_offsets(kept, offsets)
+
+
+def _without_slices(
+    chrom: Chromosome, positions: Iterator[int], size: int
+) -> Chromosome:
+    """
+    :param chrom: The chromosome to remove genes from
+    :param positions: The ascending positions of the slices to remove, in slices
+    :param size: The length of each slice
+    :return: The chromosome without the slices
+    """
+    new_chrom = bytearray()
+    previous = 0
+    for position in positions:
+        new_chrom += chrom[previous : position * size]
+        previous = (position + 1) * size
+
+    if previous == 0:
+        return chrom
+
+    new_chrom += chrom[previous:]
+    return bytes(new_chrom)
+
+
+def _kept_offsets(kept: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """
+    :param kept: A boolean array over genes, True for genes to keep
+    :param offsets: Where each chromosome starts in the genes
+    :return: Where each chromosome starts in the kept genes
+    """
+    kept_counts = np.zeros(len(kept) + 1, dtype=np.int64)
+    np.cumsum(kept, out=kept_counts[1:])
+    return kept_counts[offsets]
+
+
+def _gather_segments(
+    genes: np.ndarray, starts: np.ndarray, lengths: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    :param genes: A flat array of genes
+    :param starts: Where each segment starts in the genes
+    :param lengths: The length of each segment
+    :return: The genes of the segments one after the other, and where each segment
+        starts in them
+    """
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    indices = np.arange(offsets[-1]) + np.repeat(starts - offsets[:-1], lengths)
+    return genes[indices], offsets
 
 
 class PathFinderOperationSequence:
@@ -275,6 +482,89 @@ class PathFinderOperationSequence:
         chrom = self.choose(*self.cross(parent1, parent2))
         return self.mutate(chrom)
 
+    def breed_each(
+        self,
+        chroms: Sequence[Chromosome],
+        parents1: np.ndarray,
+        parents2: np.ndarray,
+        timer: PhaseTimer = DISABLED_TIMER,
+    ) -> List[Chromosome]:
+        """
+        Breeds many couples, one chromosome at a time. every operation is applied to
+        all the couples before the next one, so each can be timed as a whole
+        :param chroms: The chromosomes the parents are taken from
+        :param parents1: The index of the first chromosome of each couple
+        :param parents2: The index of the second chromosome of each couple
+        :param timer: Times the crossover and every mutation
+        :return: The chromosome resulting from the genetic operations, per couple
+        """
+        with timer.phase("crossover"):
+            children = [
+                self.choose(*self.cross(chroms[parent1], chroms[parent2]))
+                for parent1, parent2 in zip(parents1.tolist(), parents2.tolist())
+            ]
+
+        for mutation in self.mutations:
+            with timer.phase(f"mutation.{type(mutation).__name__}"):
+                children = [mutation(child) for child in children]
+
+        return children
+
+    def breed(
+        self,
+        chroms: Sequence[Chromosome],
+        parents1: np.ndarray,
+        parents2: np.ndarray,
+        rng: np.random.Generator,
+        timer: PhaseTimer = DISABLED_TIMER,
+    ) -> List[Chromosome]:
+        """
+        Breeds many couples at once, drawing all the random choices as arrays
+        :param chroms: The chromosomes the parents are taken from
+        :param parents1: The index of the first chromosome of each couple
+        :param parents2: The index of the second chromosome of each couple
+        :param rng: The random generator to draw with
+        :param timer: Times the crossover and every mutation
+        :return: The chromosome resulting from the genetic operations, per couple
+        """
+        with timer.phase("crossover"):
+            genes, offsets = self._cross_batch(chroms, parents1, parents2, rng)
+
+        for mutation in self.mutations:
+            with timer.phase(f"mutation.{type(mutation).__name__}"):
+                genes, offsets = mutation.mutate_batch(genes, offsets, rng)
+
+        return from_flat(genes, offsets)
+
+    def _cross_batch(
+        self,
+        chroms: Sequence[Chromosome],
+        parents1: np.ndarray,
+        parents2: np.ndarray,
+        rng: np.random.Generator,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        See breed
+        :return: The genes and offsets of the chosen child of every couple
+        """
+        genes, offsets = to_flat(chroms)
+        lengths = np.diff(offsets)
+        points1, points2 = self.cross.cut_points(
+            lengths[parents1], lengths[parents2], rng
+        )
+        # the chosen child is the head of one parent followed by the tail of the other
+        first = self.choose.choose_first(len(parents1), rng)
+        heads = np.where(first, parents1, parents2)
+        head_lengths = np.where(first, points1, points2)
+        tails = np.where(first, parents2, parents1)
+        tail_points = np.where(first, points2, points1)
+        genes, offsets = _gather_segments(
+            genes,
+            np.column_stack([offsets[heads], offsets[tails] + tail_points]).ravel(),
+            np.column_stack([head_lengths, lengths[tails] - tail_points]).ravel(),
+        )
+        return genes, offsets[::2]
+
     def mutate(self, chrom: Chromosome) -> Chromosome:
         curr = chrom
         for mutation in self.mutations:
@@ -0,0 +1,151 @@
+"""
+Parallel fitness evaluation on a pool of worker processes
+"""
+import itertools
+import logging
+import multiprocessing
+from multiprocessing.shared_memory import SharedMemory
+from typing import Sequence, List, Type, Dict, Tuple
+
+import numpy as np
+
+from path_finder.cache import BoundedCache, create_cache
+from path_finder.chromosome import Chromosome
+from path_finder.fitness import Fitness, Evaluation
+from path_finder.grid import GridWrapper
+from path_finder.point import Point
+
+# (shared memory name, shape, dtype) of every grid table
+TableSpecs = Dict[str, Tuple[str, Tuple[int, ...], str]]
+
+# worker process state, set by _init_worker
+_worker_fitness = None
+_worker_memory = None
+
+
+def _init_worker(
+    fitness_class: Type[Fitness],
+    start: Point,
+    target: Point,
+    specs: TableSpecs,
+    cache_class: Type[BoundedCache],
+    cache_budget: int,
+) -> None:
+    """
+    Attaches a worker process to the shared grid tables
+    :param fitness_class: The fitness function to evaluate with
+    :param start: The starting point on the grid
+    :param target: The target point on the grid
+    :param specs: Where to find the grid tables
+    :param cache_class: The simulation cache type of the grid
+    :param cache_budget: The byte budget of the worker's own simulation cache
+    """
+    global _worker_fitness, _worker_memory
+    _worker_memory = [SharedMemory(name) for name, _, _ in specs.values()]
+    tables = {
+        table: np.ndarray(shape, dtype=dtype, buffer=memory.buf)
+        for (table, (_, shape, dtype)), memory in zip(specs.items(), _worker_memory)
+    }
+    grid = GridWrapper.from_tables(
+        start, target, tables, cache=cache_class(cache_budget)
+    )
+    _worker_fitness = fitness_class(grid, memo=create_cache(0))
+
+
+def _evaluate_batch(chroms: Sequence[Chromosome]) -> List[Evaluation]:
+    """
+    :param chroms: The chromosomes to evaluate
+    :return: The evaluation of each chromosome
+    """
+    return _worker_fitness._evaluate(chroms)
+
+
+class ParallelEvaluator:
+    """
+    Evaluates chromosomes in batches on a persistent pool of worker processes.
+    The grid tables, along with the walking distance if the fitness function
+    computed it, are placed in shared memory once, so workers never receive the grid
+    itself or compile it again. every worker has its own simulation cache, of the grid's budget,
+    whose counters are not reported.
+    """
+
+    # a generation has tens of new chromosomes, split between the workers
+    DEFAULT_BATCH_SIZE = 16
+    DEFAULT_THRESHOLD = 16
+
+    def __init__(
+        self,
+        fitness: Fitness,
+        workers: int = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        threshold: int = DEFAULT_THRESHOLD,
+    ):
+        """
+        :param fitness: The fitness function to evaluate with
+        :param workers: Amount of worker processes. defaults to the cpu count
+        :param batch_size: Amount of chromosomes sent to a worker at once
+        :param threshold: Amount of chromosomes below which evaluation stays in the
+            calling process
+        """
+        self.batch_size = batch_size
+        self.threshold = threshold
+        self.batches = 0  # amount of batches sent to the workers
+        self._memory = []
+        specs = {}
+        for table, array in fitness.grid.tables().items():
+            memory = SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=memory.buf)[...] = array
+            self._memory.append(memory)
+            specs[table] = (memory.name, array.shape, array.dtype.str)
+
+        self._pool = multiprocessing.Pool(
+            workers,
+            initializer=_init_worker,
+            initargs=(
+                type(fitness),
+                fitness.grid.start,
+                fitness.grid.target,
+                specs,
+                type(fitness.grid.cache),
+                fitness.grid.cache.byte_budget,
+            ),
+        )
+
+    def evaluate(self, chroms: Sequence[Chromosome]) -> List[Evaluation]:
+        """
+        :param chroms: The chromosomes to evaluate
+        :return: The evaluation of each chromosome, in order
+        """
+        batches = [
+            chroms[i : i + self.batch_size]
+            for i in range(0, len(chroms), self.batch_size)
+        ]
+        self.batches += len(batches)
+        return list(
+            itertools.chain.from_iterable(self._pool.map(_evaluate_batch, batches, 1))
+        )
+
+    def close(self) -> None:
+        """
+        Stops the workers and releases the shared memory
+        """
+        if self._memory and self.batches == 0:
+            logging.warning(
+                "the evaluation workers were never used, every evaluation had less "
+                "than %d new chromosomes. lower the parallel threshold to use them",
+                self.threshold,
+            )
+
+        self._pool.close()
+        self._pool.join()
+        for memory in self._memory:
+            memory.close()
+            memory.unlink()
+
+        self._memory = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
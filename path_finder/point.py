@@ -4,12 +4,9 @@ A point in the grid
 import math
 from collections import namedtuple
 
-from functools import lru_cache
-
 Point = namedtuple("Point", "x y")
 
 
-@lru_cache()
 def distance(p1: Point, p2: Point) -> int:
     """
     Calculate the distance between two points
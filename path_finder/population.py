@@ -1,64 +1,166 @@
 """
 The population ued by the algorithm
 """
-from typing import Sequence
+from typing import Sequence, List, Tuple
 from collections import namedtuple
+
+import numpy as np
+
 from path_finder.chromosome import Chromosome
-from path_finder.fitness import Fitness
+from path_finder.fitness import Fitness, Evaluation
 
-RankedItem = namedtuple("RankedItem", "fitness chromosome")
+RankedItem = namedtuple("RankedItem", "fitness chromosome evaluation")
 
 
 class Population:
     """
     A population of chromosomes. replaced in each generation.
+    Chromosomes are kept in the order they were given, along with an array of their
+    fitness. ranks (0 is the top chromosome) are computed from the array only when
+    needed, and translated to positions in the store with `ranking`.
     """
 
-    def __init__(self, items: Sequence[Chromosome], fitness_func: Fitness):
+    def __init__(
+        self,
+        items: Sequence[Chromosome],
+        fitness_func: Fitness,
+        evaluations: Sequence[Evaluation] = None,
+    ):
         """
         :param items: List of chromosomes to use as the population
         :param fitness_func: The fitness func to use for selection process
+        :param evaluations: The evaluations of the chromosomes, if already known
         """
         self.fitness_func = fitness_func
-        self.population = sorted(
-            (RankedItem(self.fitness_func(chrom), chrom) for chrom in items),
-            key=lambda ranked_item: ranked_item.fitness,
-            reverse=True,
+        if evaluations is None:
+            evaluations = self.fitness_func.evaluate(items)
+
+        self.chromosomes: List[Chromosome] = list(items)
+        self.evaluations: List[Evaluation] = list(evaluations)
+        self.fitness = np.fromiter(
+            (evaluation.fitness for evaluation in self.evaluations),
+            dtype=np.float64,
+            count=len(self.evaluations),
         )
-        self.population_length = len(self.population)
-        self.median_index = self.population_length // 2
+        self.population_length = len(self.chromosomes)
+        self.median_rank = self.population_length // 2
+        self._ranking = None
+        self.top_index = int(np.argmax(self.fitness))  # first of the ties, as ranked
+        self._median_index = None
+
+    @property
+    def ranking(self) -> np.ndarray:
+        """
+        :return: The position in the store of each rank, from the top chromosome
+            down. ties keep their store order
+        """
+        if self._ranking is None:
+            self._ranking = np.argsort(-self.fitness, kind="stable")
+
+        return self._ranking
+
+    @property
+    def median_index(self) -> int:
+        """
+        :return: The position in the store of the chromosome with the median fitness
+        """
+        if self._median_index is None:
+            if self._ranking is not None:
+                self._median_index = int(self._ranking[self.median_rank])
+            else:
+                threshold, better = self._rank_threshold(self.median_rank)
+                tied = np.flatnonzero(self.fitness == threshold)
+                self._median_index = int(tied[self.median_rank - len(better)])
+
+        return self._median_index
+
+    def elite_indices(self, count: int) -> np.ndarray:
+        """
+        :param count: Amount of top chromosomes
+        :return: The position in the store of the top `count` chromosomes, ranked
+        """
+        if self._ranking is not None or count >= self.population_length:
+            return self.ranking[:count]
+        if count <= 0:
+            return np.empty(0, dtype=np.int64)
+
+        threshold, better = self._rank_threshold(count - 1)
+        tied = np.flatnonzero(self.fitness == threshold)[: count - len(better)]
+        elites = np.concatenate([better, tied])
+        return elites[np.lexsort((elites, -self.fitness[elites]))]
+
+    def _rank_threshold(self, rank: int) -> Tuple[float, np.ndarray]:
+        """
+        :param rank: A rank in the population
+        :return: The fitness at the rank, and the position in the store of the
+            chromosomes with a higher fitness
+        """
+        threshold = -np.partition(-self.fitness, rank)[rank]
+        return threshold, np.flatnonzero(self.fitness > threshold)
+
+    def item(self, index: int) -> RankedItem:
+        """
+        :param index: A position in the store
+        :return: The chromosome at the position along with its fitness and evaluation
+        """
+        return RankedItem(
+            float(self.fitness[index]),
+            self.chromosomes[index],
+            self.evaluations[index],
+        )
+
+    def top(self, count: int) -> List[RankedItem]:
+        """
+        :param count: Amount of top chromosomes
+        :return: The top `count` chromosomes, ranked
+        """
+        return [self.item(index) for index in self.elite_indices(count).tolist()]
 
     @property
     def items(self) -> Sequence[Chromosome]:
         """
-        :return: The chromosomes in the population
+        :return: The chromosomes in the population, ranked
         """
-        return [item.chromosome for item in self.population]
+        return [self.chromosomes[index] for index in self.ranking.tolist()]
 
     @property
     def top_item(self) -> Chromosome:
         """
         :return: The chromosome with the highest fitness in the population
         """
-        return self.population[0].chromosome
+        return self.chromosomes[self.top_index]
 
     @property
-    def top_fitness(self) -> Chromosome:
+    def top_fitness(self) -> float:
         """
         :return: The fitness of the top chromosome
         """
-        return self.population[0].fitness
+        return float(self.fitness[self.top_index])
 
     @property
     def median_item(self) -> Chromosome:
         """
         :return: The chromosome with the median fitness
         """
-        return self.population[self.median_index].chromosome
+        return self.chromosomes[self.median_index]
 
     @property
-    def median_fitness(self) -> Chromosome:
+    def median_fitness(self) -> float:
         """
         :return: The fitness of the median chromosome
         """
-        return self.population[self.median_index].fitness
+        return float(self.fitness[self.median_index])
+
+    @property
+    def top_evaluation(self) -> Evaluation:
+        """
+        :return: The evaluation of the top chromosome
+        """
+        return self.evaluations[self.top_index]
+
+    @property
+    def median_evaluation(self) -> Evaluation:
+        """
+        :return: The evaluation of the median chromosome
+        """
+        return self.evaluations[self.median_index]
@@ -0,0 +1,87 @@
+"""
+Low overhead timing of the phases of a generation
+"""
+import contextlib
+import time
+from typing import Dict
+
+
+class _Phase:
+    """
+    Adds the time spent in its block to a phase's duration
+    """
+
+    def __init__(self, durations: Dict[str, float], name: str):
+        """
+        :param durations: The durations to add to
+        :param name: The name of the phase
+        """
+        self.durations = durations
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        elapsed = time.perf_counter() - self.start
+        self.durations[self.name] = self.durations.get(self.name, 0.0) + elapsed
+
+
+_DISABLED_PHASE = contextlib.nullcontext()
+
+
+class PhaseTimer:
+    """
+    Records the durations of named phases, and counters, of the current generation.
+    a disabled timer records nothing and costs about a function call per phase.
+    sub-phases are named "<phase>.<sub-phase>", see total
+    """
+
+    def __init__(self, enabled: bool = False):
+        """
+        :param enabled: If false, nothing is recorded
+        """
+        self.enabled = enabled
+        self.durations: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+
+    def reset(self) -> None:
+        """
+        Forgets the recorded durations and counts, called when a generation starts
+        """
+        self.durations = {}
+        self.counts = {}
+
+    def phase(self, name: str):
+        """
+        :param name: The name of the phase
+        :return: A context manager timing its block as part of the phase
+        """
+        if not self.enabled:
+            return _DISABLED_PHASE
+
+        return _Phase(self.durations, name)
+
+    def count(self, name: str, amount: int) -> None:
+        """
+        :param name: The name of the counter
+        :param amount: Amount to add to the counter
+        """
+        if self.enabled:
+            self.counts[name] = self.counts.get(name, 0) + amount
+
+    def total(self, phase: str) -> float:
+        """
+        :param phase: The name of a phase
+        :return: The seconds spent in the phase and its sub-phases
+        """
+        prefix = phase + "."
+        return sum(
+            duration
+            for name, duration in self.durations.items()
+            if name == phase or name.startswith(prefix)
+        )
+
+
+DISABLED_TIMER = PhaseTimer()
@@ -4,8 +4,10 @@ Metrics collection
 import os
 import os.path
 import csv
-from typing import Iterator
-from dataclasses import dataclass, asdict
+from collections import deque
+from typing import Iterator, List, Dict
+from dataclasses import dataclass, asdict, astuple
+import numpy as np
 from dataclass_csv import DataclassReader
 from path_finder.finder import Finder
 
@@ -23,64 +25,220 @@ class FinderState:
     median_distance: int
     median_length: int
     median_fitness: float
+    cache_hits: int = 0
+    cache_misses: int = 0
+    cache_evictions: int = 0
+    memo_hits: int = 0
+    memo_misses: int = 0
+    # seconds spent in every phase of the generation, recorded when the finder
+    # profiles (see Finder.timer), 0 otherwise
+    elitism_time: float = 0.0
+    selection_time: float = 0.0
+    crossover_time: float = 0.0
+    mutation_time: float = 0.0
+    evaluation_time: float = 0.0
+    population_time: float = 0.0
+    compaction_time: float = 0.0
+    adaptation_time: float = 0.0
+    generation_evaluations: int = 0
+    generation_cache_hits: int = 0
+    generation_genes: int = 0
+    # the state of the finder's MutationController, if it adapts
+    mutation_scale: float = 1.0
+    diversity: float = 0.0
+    restarts: int = 0
 
 
+# the phases of a generation timed by Finder, each has a `<phase>_time` field
+PHASES = [
+    "elitism",
+    "selection",
+    "crossover",
+    "mutation",
+    "evaluation",
+    "population",
+    "compaction",
+    "adaptation",
+]
+
 FIELD_NAMES = list(FinderState.__annotations__.keys())
 
+# a fixed-width record of the binary report, one per reported FinderState
+RECORD_DTYPE = np.dtype(
+    [
+        (name, "<f8" if field_type is float else "<i8")
+        for name, field_type in FinderState.__annotations__.items()
+    ]
+)
+
+CSV_REPORT = "report.csv"
+BINARY_REPORT = "report.bin"
+
 
 class Reporter:
     """
-    A class used for metrics collection
+    A class used for metrics collection.
+    States are streamed to disk in batches as the run progresses, only the most
+    recent ones are kept in memory.
     """
 
-    def __init__(self, finder: Finder, path: str, print_stats: bool = False):
+    def __init__(
+        self,
+        finder: Finder,
+        path: str,
+        print_stats: bool = False,
+        interval: int = 1,
+        batch_size: int = 100,
+        history: int = 1000,
+        binary: bool = False,
+        resume: Dict[str, int] = None,
+    ):
         """
         :param finder: The finder we are tracking
         :param path: The disk path to store metrics in
         :param print_stats: debug flag, if true stats will be printed to output
+        :param interval: Only every `interval` generations are recorded. the last
+            generation is always recorded
+        :param batch_size: Amount of states buffered before writing them to disk
+        :param history: Amount of recent states kept in `stats`
+        :param binary: If true, states are also written as fixed-width records
+            (see RECORD_DTYPE) which Reader.read_records memory-maps
+        :param resume: A cursor (see cursor) of a previous report in `path` to
+            continue. the states reported after it are dropped
         """
         self.finder = finder
         self.path = path
         self.stats = None
         self.print_stats = print_stats
+        self.interval = interval
+        self.batch_size = batch_size
+        self.history = history
+        self.binary = binary
+        self.resume = resume
+        self._pending: List[FinderState] = []
+        self._csv_file = None
+        self._csv_writer = None
+        self._binary_file = None
 
     def __enter__(self):
-        self.stats = []
+        self.stats = deque(maxlen=self.history)
         os.makedirs(self.path, exist_ok=True)
-        with open(os.path.join(self.path, "initial_grid.txt"), "wt") as f:
-            f.write(str(self.finder.grid))
+        if self.finder.grid.drawable:
+            with open(os.path.join(self.path, "initial_grid.txt"), "wt") as f:
+                f.write(str(self.finder.grid))
+
+        csv_path = os.path.join(self.path, CSV_REPORT)
+        binary_path = os.path.join(self.path, BINARY_REPORT)
+        if self.resume is not None:
+            os.truncate(csv_path, self.resume["csv"])
+            self._csv_file = open(csv_path, "at")
+            self._csv_writer = csv.DictWriter(self._csv_file, FIELD_NAMES)
+        else:
+            self._csv_file = open(csv_path, "wt")
+            self._csv_writer = csv.DictWriter(self._csv_file, FIELD_NAMES)
+            self._csv_writer.writeheader()
+
+        if self.binary and self.resume is not None and "binary" in self.resume:
+            os.truncate(binary_path, self.resume["binary"])
+            self._binary_file = open(binary_path, "ab")
+        elif self.binary:
+            self._binary_file = open(binary_path, "wb")
+        elif os.path.exists(binary_path):
+            os.remove(binary_path)  # stale, from a previous run
 
         return self
 
-    def report(self) -> None:
+    def report(self, force: bool = False) -> None:
         """
         Store metrics on current generation
+        :param force: record the generation even if it is not on the interval
         """
-        top_item = self.finder.population.top_item
-        median_item = self.finder.population.median_item
+        if not force and self.finder.generation % self.interval != 0:
+            return
+
+        population = self.finder.population
+        top_evaluation = population.top_evaluation
+        median_evaluation = population.median_evaluation
+        cache_stats = self.finder.grid.cache.stats
+        memo_stats = self.finder.fitness_func.memo.stats
+        timer = self.finder.timer
+        controller = self.finder.controller
+        adaptation = {}
+        if controller is not None:
+            adaptation = dict(
+                mutation_scale=controller.scale,
+                diversity=controller.diversity,
+                restarts=controller.restarts,
+            )
         stat = FinderState(
             self.finder.generation,
-            self.finder.grid.calculate_distance(top_item),
-            len(top_item),
-            self.finder.population.top_fitness,
-            self.finder.grid.calculate_distance(median_item),
-            len(median_item),
-            self.finder.population.median_fitness,
+            top_evaluation.distance,
+            len(population.top_item),
+            top_evaluation.fitness,
+            median_evaluation.distance,
+            len(population.median_item),
+            median_evaluation.fitness,
+            cache_stats.hits,
+            cache_stats.misses,
+            cache_stats.evictions,
+            memo_stats.hits,
+            memo_stats.misses,
+            **{f"{phase}_time": timer.total(phase) for phase in PHASES},
+            generation_evaluations=timer.counts.get("evaluations", 0),
+            generation_cache_hits=timer.counts.get("cache_hits", 0),
+            generation_genes=timer.counts.get("genes", 0),
+            **adaptation,
         )
         if self.print_stats:
             print(stat)
         self.stats.append(stat)
+        self._pending.append(stat)
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Writes the buffered states to disk
+        """
+        self._csv_writer.writerows([asdict(stat) for stat in self._pending])
+        self._csv_file.flush()
+        if self._binary_file is not None:
+            np.array(
+                [astuple(stat) for stat in self._pending], dtype=RECORD_DTYPE
+            ).tofile(self._binary_file)
+            self._binary_file.flush()
+
+        self._pending = []
+
+    def cursor(self) -> Dict[str, int]:
+        """
+        Writes the buffered states to disk
+        :return: The size of every report file, to resume the report from (see
+            __init__)
+        """
+        self.flush()
+        cursor = {"csv": self._csv_file.tell()}
+        if self._binary_file is not None:
+            cursor["binary"] = self._binary_file.tell()
+
+        return cursor
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        with open(os.path.join(self.path, "report.csv"), "wt") as f:
-            writer = csv.DictWriter(f, FIELD_NAMES)
-            writer.writeheader()
-            writer.writerows([asdict(stat) for stat in self.stats])
-
-        with open(os.path.join(self.path, "final_grid.txt"), "wt") as f:
-            f.write(
-                self.finder.grid.to_table(self.finder.population.top_item).table + "\n"
-            )
+        if not self.stats or self.stats[-1].generation != self.finder.generation:
+            self.report(force=True)
+
+        self.flush()
+        self._csv_file.close()
+        if self._binary_file is not None:
+            self._binary_file.close()
+
+        if self.finder.grid.drawable:
+            with open(os.path.join(self.path, "final_grid.txt"), "wt") as f:
+                population = self.finder.population
+                table = self.finder.grid.to_table(
+                    population.top_item, population.top_evaluation.steps
+                )
+                f.write(table.table + "\n")
 
         # not deleting stats cause can be used after exit
 
@@ -101,6 +259,24 @@ class Reader:
         Reads the Reporter's metrics
         :return: A list of states the algorithm execution reported
         """
-        with open(os.path.join(self.path, "report.csv"), "rt") as f:
+        with open(os.path.join(self.path, CSV_REPORT), "rt") as f:
             reader = DataclassReader(f, FinderState)
             yield from reader
+
+    def read_records(self) -> np.ndarray:
+        """
+        Reads the Reporter's metrics as columns. binary reports are memory-mapped,
+        csv reports are parsed
+        :return: A structured array of RECORD_DTYPE, one record per reported state
+        """
+        binary_path = os.path.join(self.path, BINARY_REPORT)
+        if os.path.exists(binary_path):
+            if os.path.getsize(binary_path) == 0:
+                return np.empty(0, dtype=RECORD_DTYPE)
+
+            return np.memmap(binary_path, dtype=RECORD_DTYPE, mode="r")
+
+        return np.array(
+            [astuple(stat) for stat in self.read()],
+            dtype=RECORD_DTYPE,
+        )
@@ -2,13 +2,37 @@
 Selecting phase
 """
 import abc
-import random
-from typing import Tuple, Iterable
+import enum
+import functools
+from typing import Tuple
+
+import numpy as np
 
-from path_finder.chromosome import Chromosome
 from path_finder.population import Population
 
 
+class SelectionMethod(enum.Enum):
+    """
+    Available selection methods
+    """
+
+    RANKING = "ranking"
+    TOURNAMENT = "tournament"
+    SUS = "sus"  # stochastic universal sampling
+
+
+@functools.lru_cache(maxsize=None)
+def rank_cumulative_weights(size: int) -> np.ndarray:
+    """
+    :param size: The size of the population
+    :return: The cumulative ranking weights of the population's items, from the
+        top item (ranked `size`) to the bottom one (ranked 1)
+    """
+    weights = np.cumsum(np.arange(size, 0, -1, dtype=np.float64))
+    weights.flags.writeable = False  # shared between all populations of this size
+    return weights
+
+
 class Selector(abc.ABC):
     """
     A selector, used for the selection phase.
@@ -21,11 +45,13 @@ class Selector(abc.ABC):
         self.population = population
 
     @abc.abstractmethod
-    def select(self, count) -> Iterable[Tuple[Chromosome, Chromosome]]:
+    def select(self, count, rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
         """
-        Selects items from the Selector's population
-        :param count: Ampunt of items to select
-        :return: A list of length `count` of pairs of items
+        Selects pairs of items from the Selector's population
+        :param count: Amount of pairs to select
+        :param rng: The random generator to draw with
+        :return: The position in the population's store (see Population) of the
+            first and of the second item of each pair
         """
         raise NotImplementedError()
 
@@ -35,15 +61,68 @@ class RankingSelector(Selector):
     A selector based on the ranking method
     """
 
-    def select(self, count) -> Iterable[Tuple[Chromosome, Chromosome]]:
+    def select(self, count, rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        See Selector.select
+        """
+        weights = rank_cumulative_weights(self.population.population_length)
+        draws = rng.random((2, count)) * weights[-1]
+        first, second = self.population.ranking[
+            np.searchsorted(weights, draws, side="right")
+        ]
+        return first, second
+
+
+class TournamentSelector(Selector):
+    """
+    A selector picking the best of a few uniformly drawn items
+    """
+
+    DEFAULT_SIZE = 2
+
+    def __init__(self, population: Population, size: int = DEFAULT_SIZE):
+        """
+        See Selector.__init__
+        :param size: Amount of items competing in each tournament
+        """
+        super().__init__(population)
+        self.size = size
+
+    def select(self, count, rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
         """
         See Selector.select
         """
-        rankings, items = zip(
-            # start ranking from 1
-            *enumerate(self.population.items, 1)
-        )  # inverse of zip is zip
-        return zip(
-            random.choices(items, weights=rankings[::-1], k=count),
-            random.choices(items, weights=rankings[::-1], k=count),
+        competitors = rng.integers(
+            self.population.population_length, size=(2, count, self.size)
         )
+        winners = self.population.fitness[competitors].argmax(axis=2)
+        first, second = np.take_along_axis(
+            competitors, winners[..., np.newaxis], axis=2
+        )[..., 0]
+        return first, second
+
+
+class StochasticUniversalSelector(Selector):
+    """
+    A selector spreading evenly spaced pointers over the ranking weights, so each
+    item is selected about as often as its weight says
+    """
+
+    def select(self, count, rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        See Selector.select
+        """
+        weights = rank_cumulative_weights(self.population.population_length)
+        spacing = weights[-1] / (2 * count)
+        pointers = (rng.random() + np.arange(2 * count)) * spacing
+        # pair the selected items randomly, the pointers are ordered
+        ranks = rng.permutation(np.searchsorted(weights, pointers, side="right"))
+        selected = self.population.ranking[ranks]
+        return selected[:count], selected[count:]
+
+
+SELECTORS = {
+    SelectionMethod.RANKING: RankingSelector,
+    SelectionMethod.TOURNAMENT: TournamentSelector,
+    SelectionMethod.SUS: StochasticUniversalSelector,
+}
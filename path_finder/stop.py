@@ -0,0 +1,224 @@
+"""
+Stop criteria for Finder.run
+"""
+import abc
+import time
+from typing import Sequence
+
+
+class StopCriterion(abc.ABC):
+    """
+    Decides when a Finder should stop running. criteria can be combined with `|`
+    (stop when any of them is met) and `&` (stop when all of them are met)
+    """
+
+    def start(self, finder) -> None:
+        """
+        Called once when the run starts
+        :param finder: The finder being run
+        """
+        pass
+
+    @abc.abstractmethod
+    def __call__(self, finder) -> bool:
+        """
+        :param finder: The finder being run
+        :return: True if the finder should stop
+        """
+        raise NotImplementedError()
+
+    def __or__(self, other: "StopCriterion") -> "StopCriterion":
+        return AnyOf([self, other])
+
+    def __and__(self, other: "StopCriterion") -> "StopCriterion":
+        return AllOf([self, other])
+
+
+class Deadline(StopCriterion):
+    """
+    Stops once a wall-clock time budget is spent. the budget is checked between
+    generations, so a run may exceed it by up to one generation
+    """
+
+    def __init__(self, seconds: float):
+        """
+        :param seconds: The time budget of the run
+        """
+        self.seconds = seconds
+        self.deadline = None
+
+    def start(self, finder) -> None:
+        """
+        See StopCriterion.start
+        """
+        self.deadline = time.monotonic() + self.seconds
+
+    def __call__(self, finder) -> bool:
+        """
+        See StopCriterion.__call__
+        """
+        return time.monotonic() >= self.deadline
+
+    def __str__(self) -> str:
+        return f"deadline of {self.seconds}s"
+
+
+class EvaluationBudget(StopCriterion):
+    """
+    Stops once a number of chromosomes were simulated by the fitness function
+    """
+
+    def __init__(self, evaluations: int):
+        """
+        :param evaluations: The maximal amount of fitness evaluations
+        """
+        self.evaluations = evaluations
+
+    def __call__(self, finder) -> bool:
+        """
+        See StopCriterion.__call__
+        """
+        return finder.evaluations >= self.evaluations
+
+    def __str__(self) -> str:
+        return f"budget of {self.evaluations} evaluations"
+
+
+class GenerationLimit(StopCriterion):
+    """
+    Stops at a given generation
+    """
+
+    def __init__(self, generations: int):
+        """
+        :param generations: The generation to stop at
+        """
+        self.generations = generations
+
+    def __call__(self, finder) -> bool:
+        """
+        See StopCriterion.__call__
+        """
+        return finder.generation >= self.generations
+
+    def __str__(self) -> str:
+        return f"limit of {self.generations} generations"
+
+
+class Stagnation(StopCriterion):
+    """
+    Stops when the top fitness did not improve for a number of generations
+    """
+
+    def __init__(self, generations: int):
+        """
+        :param generations: Amount of generations without improvement to allow
+        """
+        self.generations = generations
+        self.top_fitness = None
+        self.no_change_count = 0
+
+    def start(self, finder) -> None:
+        """
+        See StopCriterion.start
+        """
+        self.top_fitness = finder.population.top_fitness
+        self.no_change_count = 0
+
+    def __call__(self, finder) -> bool:
+        """
+        See StopCriterion.__call__
+        """
+        top_fitness = finder.population.top_fitness
+        if top_fitness > self.top_fitness:
+            self.no_change_count = 0
+        elif finder.generation > 0:
+            self.no_change_count += 1
+
+        self.top_fitness = top_fitness
+        return self.no_change_count >= self.generations
+
+    def __str__(self) -> str:
+        return f"{self.generations} generations without improvement"
+
+
+class SolutionFound(StopCriterion):
+    """
+    Stops when the top chromosome reaches the target
+    """
+
+    def __init__(self, shortest: bool = True):
+        """
+        :param shortest: If true, the path must also be as short as the distance
+            between the start and the target
+        """
+        self.shortest = shortest
+
+    def __call__(self, finder) -> bool:
+        """
+        See StopCriterion.__call__
+        """
+        if not finder.population.top_evaluation.hit_target:
+            return False
+
+        return not self.shortest or len(finder.population.top_item) <= finder.min_dist
+
+    def __str__(self) -> str:
+        return "shortest solution found" if self.shortest else "solution found"
+
+
+class AnyOf(StopCriterion):
+    """
+    Stops when any of its criteria is met
+    """
+
+    def __init__(self, criteria: Sequence[StopCriterion]):
+        """
+        :param criteria: The criteria to combine
+        """
+        self.criteria = list(criteria)
+        self.met = []
+
+    def start(self, finder) -> None:
+        """
+        See StopCriterion.start
+        """
+        self.met = []
+        for criterion in self.criteria:
+            criterion.start(finder)
+
+    def __call__(self, finder) -> bool:
+        """
+        See StopCriterion.__call__
+        """
+        # every criterion is called, stateful criteria count every generation
+        self.met = [criterion for criterion in self.criteria if criterion(finder)]
+        return bool(self.met)
+
+    def __or__(self, other: StopCriterion) -> StopCriterion:
+        return AnyOf(self.criteria + [other])
+
+    def __str__(self) -> str:
+        return ", ".join(str(criterion) for criterion in self.met or self.criteria)
+
+
+class AllOf(AnyOf):
+    """
+    Stops when all of its criteria are met
+    """
+
+    def __call__(self, finder) -> bool:
+        """
+        See StopCriterion.__call__
+        """
+        super().__call__(finder)
+        return len(self.met) == len(self.criteria)
+
+    def __or__(self, other: StopCriterion) -> StopCriterion:
+        return AnyOf([self, other])
+
+    def __and__(self, other: StopCriterion) -> StopCriterion:
+        return AllOf(self.criteria + [other])
+
+    def __str__(self) -> str:
+        return " and ".join(str(criterion) for criterion in self.criteria)
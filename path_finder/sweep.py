@@ -0,0 +1,235 @@
+"""
+Scheduling of experiment sweeps over a pool of processes
+"""
+import os
+import os.path
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass
+from typing import Callable, Sequence, List, MutableMapping, Optional
+
+import progressbar
+
+from path_finder.environments import Size
+from path_finder.grid import GridWrapper
+
+DONE_MARKER = "done"
+
+
+@dataclass(frozen=True)
+class SweepJob:
+    """
+    A single run of the sweep
+    """
+
+    name: str
+    creator: Callable[[Size], GridWrapper]
+    grid_size: Optional[Size]  # None for environments of a fixed size, like maps
+    population_size: int
+
+    @property
+    def cost(self) -> int:
+        """
+        :return: an estimate of the run's relative duration, used for ordering
+        """
+        if self.grid_size is None:
+            return self.population_size
+
+        return self.grid_size.value ** 2 * self.population_size
+
+
+class Progress:
+    """
+    Reports the generation a run reached to the scheduler
+    """
+
+    def __init__(self, generations: MutableMapping[str, int], name: str):
+        """
+        :param generations: generation of each running job, shared between processes
+        :param name: The name of the reporting job
+        """
+        self.generations = generations
+        self.name = name
+
+    def __call__(self, generation: int) -> None:
+        """
+        :param generation: The generation the run reached
+        """
+        self.generations[self.name] = generation
+
+
+def _run_job(
+    runner: Callable, job: SweepJob, generations: MutableMapping[str, int]
+) -> None:
+    """
+    Executes a job in a worker process
+    :param runner: see SweepScheduler.__init__
+    :param job: The job to execute
+    :param generations: see Progress.__init__
+    """
+    runner(
+        job.name,
+        job.creator,
+        job.grid_size,
+        job.population_size,
+        progress=Progress(generations, job.name),
+    )
+
+
+class SweepScheduler:
+    """
+    Runs the jobs of a sweep on a pool of processes, longest jobs first.
+    Finished jobs leave a marker in their output directory and are skipped when
+    the sweep is restarted. a failing job does not stop the others, the failures
+    are reported once all the jobs ran
+    """
+
+    REFRESH_INTERVAL = 0.5  # seconds
+
+    def __init__(
+        self,
+        runner: Callable,
+        out_dir: str = "out",
+        workers: int = None,
+        force: bool = False,
+    ):
+        """
+        :param runner: The function executing a job. called with the job's name,
+            creator, grid size and population size, and a `progress` keyword
+            argument to report generations to
+        :param out_dir: The directory jobs write their output to
+        :param workers: Amount of processes to run jobs on. defaults to the cpu count
+        :param force: If true, finished jobs are executed again
+        """
+        self.runner = runner
+        self.out_dir = out_dir
+        self.workers = workers
+        self.force = force
+
+    def _marker_path(self, job: SweepJob) -> str:
+        return os.path.join(self.out_dir, job.name, DONE_MARKER)
+
+    def is_done(self, job: SweepJob) -> bool:
+        """
+        :param job: The job to check
+        :return: True if the job finished in a previous sweep
+        """
+        return os.path.exists(self._marker_path(job))
+
+    def pending(self, jobs: Sequence[SweepJob]) -> List[SweepJob]:
+        """
+        :param jobs: All the jobs of the sweep
+        :return: The jobs left to execute, longest first
+        """
+        return sorted(
+            (job for job in jobs if self.force or not self.is_done(job)),
+            key=lambda job: job.cost,
+            reverse=True,
+        )
+
+    def _mark_done(self, job: SweepJob) -> None:
+        with open(self._marker_path(job), "wt"):
+            pass
+
+    def run(self, jobs: Sequence[SweepJob]) -> None:
+        """
+        Executes the sweep
+        :param jobs: All the jobs of the sweep
+        """
+        pending = self.pending(jobs)
+        logging.info(
+            "%d of %d runs left, %d already done",
+            len(pending),
+            len(jobs),
+            len(jobs) - len(pending),
+        )
+        if len(pending) <= 1 or self.workers == 1:
+            failed = self._run_serial(pending)
+        else:
+            failed = self._run_parallel(pending)
+
+        if failed:
+            raise RuntimeError(
+                f"{len(failed)} of {len(pending)} runs failed",
+                [job.name for job in failed],
+            )
+
+    def _finish(self, job: SweepJob, error: Optional[BaseException]) -> bool:
+        """
+        Marks a job done, or logs its failure
+        :param job: The job that ended
+        :param error: The exception the job raised, if any
+        :return: True if the job failed
+        """
+        if error is None:
+            self._mark_done(job)
+            return False
+
+        logging.error("run %s failed", job.name, exc_info=error)
+        return True
+
+    def _run_serial(self, pending: Sequence[SweepJob]) -> List[SweepJob]:
+        """
+        Executes jobs one after the other in the current process, letting each
+        report its own progress
+        :param pending: The jobs to execute
+        :return: The jobs which failed
+        """
+        failed = []
+        for job in pending:
+            error = None
+            try:
+                self.runner(job.name, job.creator, job.grid_size, job.population_size)
+            except Exception as e:
+                error = e
+            if self._finish(job, error):
+                failed.append(job)
+
+        return failed
+
+    def _run_parallel(self, pending: Sequence[SweepJob]) -> List[SweepJob]:
+        """
+        Executes jobs on the process pool, showing the progress of all of them
+        :param pending: The jobs to execute
+        :return: The jobs which failed
+        """
+        widgets = [
+            progressbar.Counter(),
+            f"/{len(pending)} runs | ",
+            progressbar.Timer(),
+            " | ",
+            progressbar.Variable("running", format="{formatted_value}", width=1),
+        ]
+        with multiprocessing.Manager() as manager, ProcessPoolExecutor(
+            self.workers
+        ) as pool, progressbar.ProgressBar(
+            max_value=len(pending), widgets=widgets
+        ) as bar:
+            generations = manager.dict()
+            futures = {
+                pool.submit(_run_job, self.runner, job, generations): job
+                for job in pending
+            }
+            done_count = 0
+            failed = []
+            while futures:
+                done, _ = wait(
+                    futures, timeout=self.REFRESH_INTERVAL, return_when=FIRST_COMPLETED
+                )
+                for future in done:
+                    job = futures.pop(future)
+                    generations.pop(job.name, None)
+                    if self._finish(job, future.exception()):
+                        failed.append(job)
+                    done_count += 1
+
+                bar.update(
+                    done_count,
+                    running=", ".join(
+                        f"{name}: {generation}"
+                        for name, generation in sorted(generations.items())
+                    ),
+                )
+
+        return failed
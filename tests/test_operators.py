@@ -0,0 +1,137 @@
+"""
+The sampled mutations against the per-gene draws they replaced
+"""
+import math
+import random
+
+import numpy as np
+import pytest
+
+from path_finder.chromosome import random_chromosome
+from path_finder.operators import ProbabilityOperator, RemovePairMutation
+
+TRIALS = 4000
+COUNT = 50
+SIGMAS = 5  # tolerance of the statistical comparisons, in standard errors
+
+
+def remove_pair_mutation(probability: float) -> RemovePairMutation:
+    """
+    :return: A mutation removing each pair with the probability
+    """
+    # the probability is divided by half the distance
+    return RemovePairMutation(2, probability)
+
+
+def per_gene_positions(operator: ProbabilityOperator, count: int):
+    """
+    :return: The positions of the true tests, one test_probability draw per test
+    """
+    return [position for position in range(count) if operator.test_probability]
+
+
+def old_remove_pair(mutation: RemovePairMutation, chrom: bytes) -> bytes:
+    """
+    RemovePairMutation before it sampled its positions
+    """
+    it = iter(chrom)
+    return bytes(
+        sum(
+            ([d1, d2] for d1, d2 in zip(it, it) if not mutation.test_probability),
+            [],
+        )
+    )
+
+
+def draw(sampler, operator: ProbabilityOperator) -> np.ndarray:
+    """
+    :return: A (TRIALS, COUNT) array, true where a test was true
+    """
+    hits = np.zeros((TRIALS, COUNT), dtype=bool)
+    for trial in range(TRIALS):
+        hits[trial, list(sampler(operator, COUNT))] = True
+    return hits
+
+
+def assert_close(actual: float, expected: float, standard_error: float):
+    assert abs(actual - expected) <= SIGMAS * standard_error
+
+
+@pytest.mark.parametrize("probability", [0.005, 0.05, 0.3, 0.7])
+def test_positions_match_per_gene_draws(probability):
+    random.seed(1)
+    operator = ProbabilityOperator(probability)
+    sampled = draw(lambda operator, count: operator.test_positions(count), operator)
+    per_gene = draw(per_gene_positions, operator)
+
+    # the amount of mutations of a chromosome
+    sampled_counts, per_gene_counts = sampled.sum(axis=1), per_gene.sum(axis=1)
+    variance = COUNT * probability * (1 - probability)
+    # standard errors of the difference of two independent estimates
+    count_error = math.sqrt(2 * variance / TRIALS)
+    # from the variance of a sample variance, for a near normal distribution
+    variance_error = 2 * variance / math.sqrt(TRIALS) + 1e-3
+    assert_close(sampled_counts.mean(), per_gene_counts.mean(), count_error)
+    assert_close(sampled_counts.var(), per_gene_counts.var(), variance_error)
+
+    # every position is as likely to mutate as with per-gene draws
+    position_error = math.sqrt(2 * probability * (1 - probability) / TRIALS)
+    for sampled_frequency, per_gene_frequency in zip(
+        sampled.mean(axis=0), per_gene.mean(axis=0)
+    ):
+        assert_close(sampled_frequency, per_gene_frequency, position_error)
+
+
+def test_positions_are_ascending_and_in_range():
+    random.seed(2)
+    operator = ProbabilityOperator(0.3)
+    for _ in range(200):
+        positions = list(operator.test_positions(COUNT))
+        assert positions == sorted(set(positions))
+        assert all(0 <= position < COUNT for position in positions)
+
+
+@pytest.mark.parametrize("probability, expected", [(0, []), (1, list(range(COUNT)))])
+def test_positions_extreme_probabilities(probability, expected):
+    assert list(ProbabilityOperator(probability).test_positions(COUNT)) == expected
+
+
+@pytest.mark.parametrize("length", [0, 1, 2, 7, 40, 41])
+@pytest.mark.parametrize("probability", [0, 1])
+def test_remove_pair_matches_old_version_exactly(length, probability):
+    random.seed(3)
+    mutation = remove_pair_mutation(probability)
+    chrom = random_chromosome(length)
+    assert mutation(chrom) == old_remove_pair(mutation, chrom)
+
+
+@pytest.mark.parametrize("probability", [0.05, 0.3])
+def test_remove_pair_lengths_match_old_version(probability):
+    random.seed(4)
+    mutation = remove_pair_mutation(probability)
+    chroms = [random_chromosome(random.randint(0, 61)) for _ in range(TRIALS)]
+    new_lengths = np.array([len(mutation(chrom)) for chrom in chroms])
+    old_lengths = np.array([len(old_remove_pair(mutation, chrom)) for chrom in chroms])
+
+    assert (new_lengths % 2 == 0).all()
+    pairs = np.array([len(chrom) // 2 for chrom in chroms])
+    expected = 2 * pairs * (1 - probability)
+    standard_error = math.sqrt(
+        (4 * pairs * probability * (1 - probability)).sum()
+    ) / len(chroms)
+    assert_close(new_lengths.mean(), expected.mean(), standard_error)
+    assert_close(old_lengths.mean(), expected.mean(), standard_error)
+    assert_close(new_lengths.mean(), old_lengths.mean(), standard_error * 2)
+
+
+def test_remove_pair_keeps_whole_pairs_in_order():
+    random.seed(5)
+    mutation = remove_pair_mutation(0.3)
+    for _ in range(200):
+        chrom = random_chromosome(random.randint(0, 61))
+        pairs = [chrom[i : i + 2] for i in range(0, len(chrom) - 1, 2)]
+        mutated = mutation(chrom)
+        kept = [mutated[i : i + 2] for i in range(0, len(mutated), 2)]
+        # the kept pairs are a subsequence of the original pairs
+        remaining = iter(pairs)
+        assert all(any(pair == other for other in remaining) for pair in kept)